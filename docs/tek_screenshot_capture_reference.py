@@ -136,54 +136,428 @@ CRITICAL: Both scope families return RAW BINARY data from FILESystem:READFile
 - Just pure image bytes (PNG/BMP/JPEG)
 - PNG files start with magic bytes: 89 50 4E 47 0D 0A 1A 0A
 
+END OF TRANSFER DETECTION:
+--------------------------
+There is no length header, so do NOT wait for a read timeout to decide the
+file is complete (that adds seconds of dead time to every screenshot).
+Send *OPC? right after READFile as a sentinel; the scope answers it once the
+file (and its trailing linefeed) has been sent. The file end is then found
+from the data itself:
+
+    PNG   -> walk the chunk headers up to the IEND chunk
+    BMP   -> file size is stored in bytes 2..5 of the BMP header
+    JPEG  -> FF D9 end-of-image marker followed by the "1" sentinel reply
+    TIFF  -> end of the last IFD, tag value or image strip/tile the IFDs point to
+    other -> not supported, the end cannot be told apart from file data
+
+Both read methods below call _read_image() with their own chunk reader.
+
+COMMAND SYNCHRONIZATION:
+------------------------
+No fixed time.sleep() between commands. Set commands are processed in
+order, so only overlapping operations (SAVE:IMAGe, EXPort START) need a
+wait. OpcSync sends *OPC after them and polls *ESR? with exponential
+backoff (1 ms doubling up to 200 ms) until the operation complete bit is
+set: a fast scope answers the first poll, a slow one is still waited for.
+Error bits seen while polling are kept for the following error check.
+
 PyVISA BINARY READ METHOD:
 --------------------------
 The standard scope.read_raw() may timeout because it waits for termination.
-Use visalib.read() directly with status code checking:
+Use visalib.read() directly and stop when the image is complete:
 
-    image_data = bytearray()
-    scope.timeout = 5000  # 5 second chunks
-    
-    while True:
-        try:
-            chunk, status = scope.visalib.read(scope.session, 65536)
-            if chunk:
-                image_data.extend(bytes(chunk))
-            
-            # Check if transfer complete
-            if status != pyvisa.constants.StatusCode.success_max_count_read:
-                break
-        except pyvisa.errors.VisaIOError:
-            break
+    scope.write(f'FILESystem:READFile "{path}"')
+    scope.write("*OPC?")    # sentinel
+    image_data = _read_image(
+        lambda: bytes(scope.visalib.read(scope.session, 65536)[0]))
 
 RAW SOCKET BINARY READ METHOD:
 ------------------------------
-Read in chunks with timeout to detect end of transfer:
+Read in chunks and stop when the image is complete:
 
-    sock.settimeout(5)  # 5 second chunks
-    data = bytearray()
-    
-    while True:
-        try:
-            chunk = sock.recv(65536)
-            if chunk:
-                data.extend(chunk)
-            else:
-                break
-        except socket.timeout:
-            if len(data) > 0:
-                break  # Got data, transfer complete
+    sock.sendall(f'FILESystem:READFile "{path}"\n*OPC?\n'.encode())
+    image_data = _read_image(lambda: sock.recv(65536))
 
 ================================================================================
 UNIFIED PYTHON IMPLEMENTATION
 ================================================================================
 """
 
+import json
+import os
+import re
 import socket
+import struct
+import threading
 import time
 from datetime import datetime
 
 
+# =============================================================================
+# PERSISTENT SESSION POOL
+# =============================================================================
+#
+# Connecting and identifying (*IDN?) costs a TCP handshake plus a round trip.
+# Sessions are kept open per (host, port) and reused by capture_screenshot()
+# and TekScreenshotCapture, so repeated captures only pay it once.
+
+MAX_IDLE_SESSIONS = 8       # idle connections kept open across all scopes
+PROBE_AFTER_IDLE = 2.0      # seconds idle before a session is health checked
+
+
+# =============================================================================
+# CAPABILITY CACHE
+# =============================================================================
+#
+# Series and the verified screenshot command set are stored on disk per
+# model/serial/firmware (*IDN? fields 2-4). A scope seen before skips the
+# discovery steps; a firmware update starts a new entry. Same file and
+# format as helper/capability_cache.py.
+
+CAPABILITY_CACHE = os.path.join(os.path.expanduser('~'), '.tek_instr_capabilities.json')
+
+
+def _idn_key(idn):
+    return ','.join(p.strip() for p in idn.split(',')[1:4])
+
+
+def _load_capabilities(idn):
+    """Cached capability dict for this scope and firmware, {} if unknown"""
+    try:
+        with open(CAPABILITY_CACHE) as f:
+            return json.load(f).get(_idn_key(idn), {})
+    except (OSError, ValueError):
+        return {}
+
+
+def _save_capabilities(idn, **caps):
+    """Merge caps into the cache entry of this scope and firmware"""
+    try:
+        with open(CAPABILITY_CACHE) as f:
+            entries = json.load(f)
+    except (OSError, ValueError):
+        entries = {}
+    entry = entries.setdefault(_idn_key(idn), {})
+    entry.update(caps, updated=time.time())
+    temp = f"{CAPABILITY_CACHE}.{os.getpid()}.tmp"
+    with open(temp, 'w') as f:
+        json.dump(entries, f, indent=2)
+    os.replace(temp, CAPABILITY_CACHE)  # atomic, shared with helper/capability_cache.py
+    return entry
+
+
+# =============================================================================
+# DETERMINISTIC END OF FILE TRANSFER
+# =============================================================================
+#
+# FILESystem:READFile sends raw file bytes with no length header. Instead of
+# waiting for an idle timeout, *OPC? is sent right after READFile and the end
+# of the file is found from the file format, see BINARY DATA TRANSFER NOTES.
+
+PNG_MAGIC = b'\x89PNG\r\n\x1a\n'
+_SENTINEL = re.compile(rb'\n?1\n')                 # optional file linefeed + *OPC? reply
+_JPEG_END = re.compile(rb'\xff\xd9(?=\n?1\n)')     # end-of-image marker followed by the sentinel
+_TIFF_TYPE_SIZE = {1: 1, 2: 1, 3: 2, 4: 4, 5: 8, 6: 1, 7: 1, 8: 2, 9: 4, 10: 8, 11: 4, 12: 8}
+_TIFF_DATA_TAGS = ((273, 279), (324, 325))          # (StripOffsets, StripByteCounts), (TileOffsets, TileByteCounts)
+
+
+def _tiff_end(data):
+    """
+    Return the length of the TIFF file at the start of data, or None if more
+    bytes are needed. The file ends with the furthest of its IFDs, the tag
+    values stored outside the IFDs and the image strips/tiles.
+    """
+    order = '<' if data[:2] == b'II' else '>'
+    end = 8
+    ifd = struct.unpack(order + 'I', data[4:8])[0]
+    while ifd:
+        if len(data) < ifd + 2:
+            return None
+        count = struct.unpack(order + 'H', data[ifd:ifd + 2])[0]
+        next_pos = ifd + 2 + 12 * count
+        if len(data) < next_pos + 4:
+            return None
+        end = max(end, next_pos + 4)
+        values = {}
+        for pos in range(ifd + 2, next_pos, 12):
+            tag, typ, n, value = struct.unpack(order + 'HHII', data[pos:pos + 12])
+            size = _TIFF_TYPE_SIZE.get(typ, 1) * n
+            if size > 4:    # value stored outside the IFD at offset 'value'
+                end = max(end, value + size)
+            values[tag] = (typ, n, value, pos + 8 if size <= 4 else value)
+        for offsets_tag, counts_tag in _TIFF_DATA_TAGS:
+            if offsets_tag not in values or counts_tag not in values:
+                continue
+            arrays = []
+            for tag in (offsets_tag, counts_tag):
+                typ, n, _, pos = values[tag]
+                fmt = 'H' if typ == 3 else 'I'
+                if len(data) < pos + struct.calcsize(fmt) * n:
+                    return None
+                arrays.append(struct.unpack(f'{order}{n}{fmt}', data[pos:pos + struct.calcsize(fmt) * n]))
+            end = max([end] + [o + c for o, c in zip(*arrays)])
+        ifd = struct.unpack(order + 'I', data[next_pos:next_pos + 4])[0]
+    return end if len(data) >= end else None
+
+
+def _image_end(data):
+    """
+    Return the length of the file at the start of data, or None if more
+    bytes are needed. Covers IEEE 488.2 blocks, PNG, BMP, JPEG and TIFF;
+    other formats raise ValueError, their end cannot be found reliably.
+    """
+    if len(data) < 8:
+        return None
+    if data[:1] == b'#':
+        if len(data) < 2 + int(data[1:2], 16):
+            return None
+        digits = int(data[1:2], 16)
+        return 2 + digits + int(data[2:2 + digits])
+    if data[:8] == PNG_MAGIC:
+        pos = 8
+        while len(data) >= pos + 8:
+            length, tag = struct.unpack('>I4s', data[pos:pos + 8])
+            pos += 12 + length      # length, type, data, CRC
+            if tag == b'IEND':
+                return pos if len(data) >= pos else None
+        return None
+    if data[:2] == b'BM':
+        return struct.unpack('<I', data[2:6])[0] if len(data) >= 6 else None
+    if data[:2] == b'\xff\xd8':
+        m = _JPEG_END.search(data, 2)
+        return m.end() if m else None
+    if data[:4] in (b'II*\x00', b'MM\x00*'):
+        return _tiff_end(data)
+    raise ValueError(f"unsupported image format, file starts with {bytes(data[:8])!r}")
+
+
+def _read_image(read_some):
+    """
+    Read one READFile transfer followed by its *OPC? sentinel reply.
+
+    Args:
+        read_some: callable returning the next received chunk (b'' when closed)
+
+    Returns:
+        bytes: file contents, the trailing linefeed and sentinel are consumed
+    """
+    data = bytearray()
+    end = None
+    while end is None or not _SENTINEL.fullmatch(data, end):
+        if end is not None and len(data) - end > 3:
+            raise ValueError("unexpected data after end of file")
+        chunk = read_some()
+        if not chunk:
+            raise ConnectionError("connection closed during file transfer")
+        data += chunk
+        if end is None:
+            end = _image_end(data)
+    return bytes(data[:end])
+
+
+# =============================================================================
+# SLEEP-FREE COMMAND SYNCHRONIZATION
+# =============================================================================
+
+class OpcSync:
+    """
+    Waits for overlapping operations by polling the event status register.
+
+    Works with any write/query pair (raw socket session or PyVISA resource).
+
+    Usage:
+        sync = OpcSync(scope.write, scope.query)
+        sync.clear()                        # *CLS
+        scope.write('SAVE:IMAGe "C:/Temp/a.png"')
+        sync.wait()                         # returns once the save is done
+        if sync.errors(scope.query("*ESR?")): ...
+    """
+
+    def __init__(self, write, query, timeout=30, first_poll=0.001, max_poll=0.2):
+        self.write = write
+        self.query = query
+        self.timeout = timeout          # seconds before wait() gives up
+        self.first_poll = first_poll    # first backoff delay in seconds
+        self.max_poll = max_poll        # backoff delay limit in seconds
+        self.esr = 0                    # error bits read while polling
+
+    def clear(self):
+        """*CLS, clears the event status register and the kept error bits"""
+        self.write("*CLS")
+        self.esr = 0
+
+    def wait(self, timeout=None):
+        """Send *OPC and poll *ESR? with backoff until bit 0 (OPC) is set"""
+        self.write("*OPC")
+        deadline = time.time() + (self.timeout if timeout is None else timeout)
+        delay = self.first_poll
+        while True:
+            esr = int(self.query("*ESR?").strip() or 0)
+            self.esr |= esr & ~1        # *ESR? clears the register, keep errors
+            if esr & 1:
+                return
+            if time.time() > deadline:
+                raise TimeoutError("operation did not complete")
+            time.sleep(delay)
+            delay = min(delay * 2, self.max_poll)
+
+    def errors(self, esr="0"):
+        """Combine a *ESR? reply with the kept error bits, clears them"""
+        bits = (int(esr.strip() or 0) | self.esr) & ~1
+        self.esr = 0
+        return bits
+
+
+class _BufferedReader:
+    """
+    Receive buffer over a raw socket.
+
+    Responses are received in chunks of up to 64 KiB and split at the
+    linefeed, so a *IDN?, *ESR? or ALLEV? reply costs one or two recv()
+    calls instead of one per byte. Bytes received past a linefeed stay
+    buffered for the next read.
+    """
+
+    def __init__(self, sock, chunk_size=65536):
+        self.sock = sock
+        self.chunk_size = chunk_size
+        self.buf = bytearray()
+
+    def _fill(self):
+        chunk = self.sock.recv(self.chunk_size)
+        if not chunk:
+            raise ConnectionError("connection closed by scope")
+        self.buf += chunk
+
+    def readline(self):
+        """Return bytes up to (not including) the next linefeed"""
+        eol = self.buf.find(b'\n')
+        while eol < 0:
+            start = len(self.buf)   # only scan newly received bytes
+            self._fill()
+            eol = self.buf.find(b'\n', start)
+        line = bytes(self.buf[:eol])
+        del self.buf[:eol + 1]
+        return line
+
+    def read_some(self):
+        """Return buffered bytes if any, else the next received chunk"""
+        if self.buf:
+            data = bytes(self.buf)
+            self.buf.clear()
+            return data
+        return self.sock.recv(self.chunk_size)
+
+
+class _ScopeSession:
+    """Persistent raw socket connection to one scope"""
+
+    def __init__(self, host, port, timeout=30):
+        self.host = host
+        self.port = port
+        self.sock = socket.create_connection((host, port), timeout=timeout)
+        self.sock.settimeout(timeout)
+        self.reader = _BufferedReader(self.sock)
+        self.last_used = time.time()
+        self.desynced = False   # a reply timed out, its late remainder would answer the next query
+        self.sync = OpcSync(self.send, self.query)
+        self.idn = self.query("*IDN?")
+        self.caps = _load_capabilities(self.idn)
+        self.series = self.caps.get('series') or detect_scope_series(self.idn)
+
+    def send(self, cmd):
+        """Send SCPI command with newline termination"""
+        self.sock.sendall((cmd + "\n").encode())
+
+    def recv_line(self, timeout=5):
+        """Read text response until newline"""
+        self.sock.settimeout(timeout)
+        try:
+            data = self.reader.readline()
+        except socket.timeout:  # incomplete reply, return what arrived
+            data = bytes(self.reader.buf)
+            self.reader.buf.clear()
+            self.desynced = True    # never pooled again, see _release_session()
+        return data.decode().strip()
+
+    def query(self, cmd, timeout=5):
+        """Send command and read response"""
+        self.send(cmd)
+        return self.recv_line(timeout)
+
+    def recv_binary(self, timeout=60):
+        """Read a READFile transfer followed by its *OPC? sentinel reply"""
+        self.sock.settimeout(timeout)   # only reached if the scope stops sending
+        data = _read_image(self.reader.read_some)
+        print(f"[INFO] Transfer complete")
+        return data
+
+    def check_error(self):
+        """Check for SCPI errors, return error string or None"""
+        if self.sync.errors(self.query("*ESR?")):
+            err = self.query("ALLEV?")
+            return err
+        return None
+
+    def is_alive(self):
+        """Cheap *OPC? probe, False if the scope no longer answers"""
+        try:
+            return self.query("*OPC?", timeout=2) == "1"
+        except OSError:
+            return False
+
+    def close(self):
+        try:
+            self.sock.close()
+        except OSError:
+            pass
+
+
+_SESSION_POOL = []          # idle sessions, oldest first
+_SESSION_LOCK = threading.Lock()
+
+
+def _acquire_session(host, port, timeout=30):
+    """Return an idle healthy session for host:port, or open a new one"""
+    while True:
+        with _SESSION_LOCK:
+            session = next((s for s in _SESSION_POOL
+                            if (s.host, s.port) == (host, port)), None)
+            if session is None:
+                break
+            _SESSION_POOL.remove(session)
+        if time.time() - session.last_used < PROBE_AFTER_IDLE or session.is_alive():
+            session.sock.settimeout(timeout)
+            return session
+        session.close()     # stale connection, reconnect
+    return _ScopeSession(host, port, timeout)
+
+
+def _release_session(session):
+    """Return a session to the pool, closing the oldest beyond MAX_IDLE_SESSIONS"""
+    if session.desynced:    # a timed-out reply may still arrive, the connection cannot be reused
+        session.close()
+        return
+    session.last_used = time.time()
+    with _SESSION_LOCK:
+        _SESSION_POOL.append(session)
+        evicted = _SESSION_POOL[:-MAX_IDLE_SESSIONS]
+        del _SESSION_POOL[:-MAX_IDLE_SESSIONS]
+    for old in evicted:
+        old.close()
+
+
+def close_sessions(host=None, port=None):
+    """Close pooled sessions (all, or only those for host/port)"""
+    with _SESSION_LOCK:
+        closing = [s for s in _SESSION_POOL
+                   if host is None or (s.host, s.port) == (host, port)]
+        for s in closing:
+            _SESSION_POOL.remove(s)
+    for s in closing:
+        s.close()
+
+
 def detect_scope_series(idn_string):
     """
     Detect scope series from *IDN? response.
@@ -263,76 +637,28 @@ def capture_screenshot(host, port=4000, filename=None, format="PNG"):
     print(f"{'='*60}")
     print(f"[INFO] Connecting to {host}:{port}...")
     
-    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-    sock.settimeout(30)
+    session = None
+    reusable = False
     
     try:
-        sock.connect((host, port))
+        session = _acquire_session(host, port, timeout=30)
         print(f"[INFO] Connected!")
         
         # === HELPER FUNCTIONS ===
-        def send(cmd):
-            """Send SCPI command with newline termination"""
-            sock.sendall((cmd + "\n").encode())
-            time.sleep(0.05)
-        
-        def recv_line(timeout=5):
-            """Read text response until newline"""
-            sock.settimeout(timeout)
-            data = b""
-            try:
-                while True:
-                    b = sock.recv(1)
-                    if not b or b == b'\n':
-                        break
-                    data += b
-            except socket.timeout:
-                pass
-            return data.decode().strip()
-        
-        def query(cmd):
-            """Send command and read response"""
-            send(cmd)
-            return recv_line()
-        
-        def recv_binary(timeout=60):
-            """Read binary data until timeout (scope sends raw bytes)"""
-            sock.settimeout(5)  # 5 second chunks
-            data = bytearray()
-            start = time.time()
-            
-            while time.time() - start < timeout:
-                try:
-                    chunk = sock.recv(65536)
-                    if chunk:
-                        data.extend(chunk)
-                        print(f"[INFO] +{len(chunk):,} bytes (total: {len(data):,})")
-                    else:
-                        break
-                except socket.timeout:
-                    if len(data) > 0:
-                        print(f"[INFO] Transfer complete")
-                        break
-            
-            return bytes(data)
-        
-        def check_error():
-            """Check for SCPI errors, return error string or None"""
-            esr = query("*ESR?")
-            if esr and esr != "0":
-                err = query("ALLEV?")
-                return err
-            return None
+        send = session.send
+        query = session.query
+        recv_binary = session.recv_binary
+        check_error = session.check_error
+        sync = session.sync
         
-        # === IDENTIFY SCOPE ===
-        idn = query("*IDN?")
+        # === IDENTIFY SCOPE (once per pooled connection) ===
+        idn = session.idn
         print(f"[INFO] Scope: {idn}")
         
-        series = detect_scope_series(idn)
+        series = session.series
         print(f"[INFO] Detected series: {series}")
         
-        send("*CLS")
-        time.sleep(0.1)
+        sync.clear()
         
         # === GENERATE PATHS ===
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
@@ -362,19 +688,19 @@ def capture_screenshot(host, port=4000, filename=None, format="PNG"):
             send(f"EXPort:FORMat {format.upper()}")
             send("EXPort:VIEW FULLSCREEN")
             send("EXPort:PALEtte COLOR")
-            time.sleep(0.1)
             
-            # Verify filename was set
-            fn = query("EXPort:FILEName?")
-            print(f"[INFO] EXPort:FILEName? = {fn}")
+            # Verify filename was set (skipped once EXPort is verified on this scope)
+            if not session.caps.get('screenshot_verified'):
+                fn = query("EXPort:FILEName?")
+                print(f"[INFO] EXPort:FILEName? = {fn}")
             
             # Trigger the export
             print("[INFO] TX: EXPort START")
             send("EXPort START")
             
             # Wait for completion
-            opc = query("*OPC?")
-            print(f"[INFO] *OPC? = {opc}")
+            sync.wait()
+            print(f"[INFO] Operation complete")
             
         else:
             # ===== MSO 4/5/6 SERIES (and unknown) =====
@@ -383,19 +709,17 @@ def capture_screenshot(host, port=4000, filename=None, format="PNG"):
             # Configure (optional, ignore errors for unsupported commands)
             send("SAVE:IMAGe:VIEWTYpe FULLScreen")
             send("SAVE:IMAGe:COMPosition NORMal")
-            time.sleep(0.1)
             
             # Clear any config errors (some commands may not exist)
-            send("*CLS")
-            time.sleep(0.1)
+            sync.clear()
             
             # Trigger save (format determined by file extension!)
             print(f'[INFO] TX: SAVE:IMAGe "{remote_path}"')
             send(f'SAVE:IMAGe "{remote_path}"')
             
             # Wait for completion
-            opc = query("*OPC?")
-            print(f"[INFO] *OPC? = {opc}")
+            sync.wait()
+            print(f"[INFO] Operation complete")
         
         # === CHECK FOR ERRORS ===
         err = check_error()
@@ -406,10 +730,10 @@ def capture_screenshot(host, port=4000, filename=None, format="PNG"):
         print("[INFO] ✓ Screenshot saved on scope!")
         
         # === TRANSFER FILE ===
-        print(f"\n[INFO] Transferring file...")
-        time.sleep(1)  # Wait for file to be fully written
+        print(f"\n[INFO] Transferring file...")     # file is complete once OPC is set
         
         send(f'FILESystem:READFile "{remote_path}"')
+        send("*OPC?")   # sentinel, answered once the whole file was sent
         
         image_data = recv_binary(timeout=60)
         
@@ -446,10 +770,6 @@ def capture_screenshot(host, port=4000, filename=None, format="PNG"):
                 elif idx < 0:
                     print("[WARN] PNG header not found!")
         
-        # Strip trailing newline if present
-        if image_data.endswith(b'\n'):
-            image_data = image_data[:-1]
-        
         # === SAVE LOCAL FILE ===
         with open(filename, 'wb') as f:
             f.write(image_data)
@@ -464,6 +784,11 @@ def capture_screenshot(host, port=4000, filename=None, format="PNG"):
         print(f"  Size: {len(image_data):,} bytes")
         print(f"{'='*50}")
         
+        if not session.caps.get('screenshot_verified'):
+            command = 'EXPort START' if series == 'mso70k' else 'SAVE:IMAGe'
+            session.caps = _save_capabilities(idn, series=series, screenshot=command, screenshot_verified=True)
+        
+        reusable = True
         return filename
         
     except socket.timeout:
@@ -476,7 +801,11 @@ def capture_screenshot(host, port=4000, filename=None, format="PNG"):
         print(f"[ERROR] {type(e).__name__}: {e}")
         return None
     finally:
-        sock.close()
+        if session is not None:
+            if reusable:
+                _release_session(session)   # keep connection for the next capture
+            else:
+                session.close()
 
 
 def capture_screenshot_pyvisa(resource_string, filename=None, format="PNG"):
@@ -524,8 +853,8 @@ def capture_screenshot_pyvisa(resource_string, filename=None, format="PNG"):
         series = detect_scope_series(idn)
         print(f"[INFO] Series: {series}")
         
-        scope.write("*CLS")
-        time.sleep(0.1)
+        sync = OpcSync(scope.write, scope.query)
+        sync.clear()
         
         # === GENERATE PATHS ===
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
@@ -551,58 +880,38 @@ def capture_screenshot_pyvisa(resource_string, filename=None, format="PNG"):
             scope.write(f"EXPort:FORMat {format.upper()}")
             scope.write("EXPort:VIEW FULLSCREEN")
             scope.write("EXPort:PALEtte COLOR")
-            time.sleep(0.1)
             
             scope.write("EXPort START")
         else:
             print("[INFO] Using SAVE:IMAGe method")
             scope.write("SAVE:IMAGe:VIEWTYpe FULLScreen")
             scope.write("SAVE:IMAGe:COMPosition NORMal")
-            scope.write("*CLS")
-            time.sleep(0.1)
+            sync.clear()
             
             scope.write(f'SAVE:IMAGe "{remote_path}"')
         
         # Wait for completion
-        opc = scope.query("*OPC?")
-        print(f"[INFO] *OPC? = {opc.strip()}")
+        sync.wait()
+        print(f"[INFO] Operation complete")
         
         # Check errors
-        esr = scope.query("*ESR?")
-        if esr.strip() != "0":
+        if sync.errors(scope.query("*ESR?")):
             err = scope.query("ALLEV?")
             print(f"[ERROR] {err.strip()}")
             return None
         
         print("[INFO] ✓ Screenshot saved on scope!")
-        time.sleep(1)
         
         # === TRANSFER ===
         print("[INFO] Transferring file...")
         scope.write(f'FILESystem:READFile "{remote_path}"')
+        scope.write("*OPC?")    # sentinel, answered once the whole file was sent
         
-        # Use visalib.read() for reliable binary transfer
-        # This avoids timeout issues with read_raw()
-        image_data = bytearray()
-        scope.timeout = 5000  # 5 second timeout per chunk
-        
-        while True:
-            try:
-                chunk, status = scope.visalib.read(scope.session, 65536)
-                if chunk:
-                    image_data.extend(bytes(chunk))
-                    print(f"[INFO] +{len(chunk):,} bytes (total: {len(image_data):,})")
-                
-                # Check if transfer complete
-                # success_max_count_read means more data available
-                if status != pyvisa.constants.StatusCode.success_max_count_read:
-                    print(f"[INFO] Transfer complete")
-                    break
-            except pyvisa.errors.VisaIOError:
-                if len(image_data) > 0:
-                    print(f"[INFO] Transfer complete (timeout)")
-                    break
-                raise
+        # Use visalib.read() for reliable binary transfer, the end of the file
+        # is found from its format instead of a timeout (see _read_image)
+        image_data = _read_image(
+            lambda: bytes(scope.visalib.read(scope.session, 65536)[0]))
+        print(f"[INFO] Transfer complete")
         
         if not image_data:
             print("[ERROR] No data received!")
@@ -622,10 +931,6 @@ def capture_screenshot_pyvisa(resource_string, filename=None, format="PNG"):
                     print(f"[INFO] PNG at offset {idx}, trimming")
                     image_data = image_data[idx:]
         
-        # Strip trailing newline
-        if image_data.endswith(b'\n'):
-            image_data = image_data[:-1]
-        
         # Save
         with open(filename, 'wb') as f:
             f.write(image_data)
@@ -683,6 +988,10 @@ class TekScreenshotCapture:
         # Get scope info
         print(capture.idn)
         print(capture.series)
+        
+        # Connection opened by __init__ is pooled and reused by every
+        # capture() call; close it when done
+        capture.close()
     """
     
     def __init__(self, host, port=4000):
@@ -700,35 +1009,22 @@ class TekScreenshotCapture:
         self._detect_scope()
     
     def _detect_scope(self):
-        """Connect briefly to detect scope type"""
+        """Identify scope on a pooled session that capture() then reuses"""
         try:
-            sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-            sock.settimeout(5)
-            sock.connect((self.host, self.port))
-            
-            sock.sendall(b"*IDN?\n")
-            time.sleep(0.1)
-            
-            data = b""
-            sock.settimeout(2)
-            try:
-                while True:
-                    b = sock.recv(1)
-                    if not b or b == b'\n':
-                        break
-                    data += b
-            except socket.timeout:
-                pass
-            
-            self.idn = data.decode().strip()
-            self.series = detect_scope_series(self.idn)
-            sock.close()
+            session = _acquire_session(self.host, self.port, timeout=5)
+            self.idn = session.idn
+            self.series = session.series
+            _release_session(session)
             
         except Exception as e:
             print(f"[WARN] Could not detect scope: {e}")
             self.idn = None
             self.series = 'unknown'
     
+    def close(self):
+        """Close the pooled connection(s) to this scope"""
+        close_sessions(self.host, self.port)
+    
     def capture(self, filename=None, format="PNG"):
         """
         Capture screenshot from oscilloscope.
@@ -0,0 +1,253 @@
+#!/usr/bin/env python
+'''
+asyncio version of socket_instr.SocketInstr
+Mirrors the write/query/read_bytes/read_bin_wave/fetch_screen surface as coroutines so one
+event loop can keep many instruments busy at the same time, without one thread per instrument.
+Every call accepts a per-call timeout (seconds), calls to one instrument are serialized by a lock.
+Timeouts raise socket_instr.InstrTimeoutError, the same exception types as SocketInstr.
+A call that is cancelled or times out part way through a response marks the connection out of sync,
+the next call then sends a device clear (!d) and resynchronizes with *opc? before continuing.
+Uses only python built-in modules, plus socket_instr.py in CWD
+
+    Example:
+        async def main():
+            scopes = [await AsyncSocketInstr.connect(ip, 4000) for ip in ('192.168.1.10', '192.168.1.11')]
+            print(await asyncio.gather(*(s.query('*idn?') for s in scopes)))
+
+    Disclaimer:
+    This program is a proof of concept and provided "As-is".
+    Its contents may be altered to suit different applications.
+
+    Tested using Python v3.10.5
+'''
+
+import asyncio
+import struct
+from socket_instr import parse_ldir, split_response, InstrConnectionError, InstrTimeoutError, InstrProtocolError, PNG_SIGNATURE  # socket_instr module required, include socket_instr.py in CWD
+
+
+class AsyncSocketInstr(object):
+    def __init__(self, reader, writer, timeout=10, chunk_size=65536):  # use AsyncSocketInstr.connect() to create
+
+        self.reader = reader
+        self.writer = writer
+        self.timeout = timeout          # default per-call timeout in seconds, None waits forever
+        self.chunk_size = chunk_size    # stream read size for binary data
+        self._lock = asyncio.Lock()     # one outstanding command/response per instrument
+        self._desync = False            # set when a call was abandoned mid-response
+
+    @classmethod
+    async def connect(cls, host, port, timeout=10, chunk_size=65536):  # opens stream connection to instrument
+
+        # stream limit = chunk_size keeps the reader buffer (and flow control) bounded during large transfers
+        try:
+            reader, writer = await asyncio.wait_for(asyncio.open_connection(host, port, limit=chunk_size), timeout)
+        except asyncio.TimeoutError as e:
+            raise InstrTimeoutError(f'could not connect to {host}:{port}: timed out') from e
+        except OSError as e:
+            raise InstrConnectionError(f'could not connect to {host}:{port}: {e}') from e
+        return cls(reader, writer, timeout, chunk_size)
+
+    async def close(self):  # informs server (instrument) prior to closure
+
+        self.writer.close()
+        await self.writer.wait_closed()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.close()
+
+    async def _run(self, fn, *args, timeout=None):  # runs one operation under the instrument lock with a timeout
+
+        timeout = self.timeout if timeout is None else timeout
+        async with self._lock:
+            try:
+                if self._desync:
+                    await asyncio.wait_for(self._resync(), self.timeout)
+                return await asyncio.wait_for(fn(*args), timeout)
+            except asyncio.CancelledError:
+                self._desync = True     # partial response may still be in flight
+                raise
+            except asyncio.TimeoutError as e:   # same exception type as SocketInstr, desync handling unchanged
+                self._desync = True
+                raise InstrTimeoutError(f'no response within {timeout} s') from e
+
+    async def _resync(self):    # device clear, then discard everything up to the *opc? reply
+
+        self.writer.write(b'!d\n*opc?\n')
+        await self.writer.drain()
+        while (await self._readline()).strip() != b'1':
+            pass
+        self._desync = False
+
+    async def _send(self, scpi):
+        self.writer.write(f'{scpi}\n'.encode('latin_1'))    # convert string to Bytes prior to send
+        await self.writer.drain()
+
+    async def _readline(self):  # reads up to and including linefeed, responses longer than the stream limit are accumulated
+
+        resp = bytearray()
+        while True:
+            try:
+                resp += await self.reader.readuntil(b'\n')
+                return resp
+            except asyncio.LimitOverrunError as e:
+                resp += await self._readexactly(e.consumed)
+            except asyncio.IncompleteReadError as e:
+                raise InstrConnectionError('connection closed by instrument') from e
+
+    async def _readexactly(self, n_bytes):  # reader.readexactly() raising InstrConnectionError when the instrument closes the connection
+        try:
+            return await self.reader.readexactly(n_bytes)
+        except asyncio.IncompleteReadError as e:
+            raise InstrConnectionError('connection closed by instrument') from e
+
+    async def _read(self):
+        return (await self._readline()).decode('latin_1').strip()
+
+    async def _query(self, scpi):
+        await self._send(scpi)
+        return await self._read()
+
+    async def _recv_into(self, mv):     # fills writable byte memoryview 'mv' completely
+        pos = 0
+        while pos < mv.nbytes:
+            chunk = await self.reader.read(min(mv.nbytes - pos, self.chunk_size))
+            if not chunk:
+                raise InstrConnectionError('connection closed by instrument')
+            mv[pos:pos + len(chunk)] = chunk
+            pos += len(chunk)
+
+    async def _read_bytes(self, n_bytes):
+        raw_data = bytearray(n_bytes)
+        await self._recv_into(memoryview(raw_data))
+        return raw_data
+
+    async def _read_block_header(self):     # IEEE 488.2 definite length block header, returns number of data bytes
+        c = await self._readexactly(1)
+        while c in (b'\n', b'\r', b' '):    # skip stray whitespace left before the block
+            c = await self._readexactly(1)
+        if c != b'#':
+            error_message = f'expected IEEE 488.2 block header, received {c!r}'
+            raise InstrProtocolError(error_message)
+        byte_len = int(await self._readexactly(1), base=16)
+        return int(await self._readexactly(byte_len))
+
+    async def _skip_linefeed(self):
+        if await self._readexactly(1) != b'\n':
+            error_message = 'binary block did not end with linefeed'
+            raise InstrProtocolError(error_message)
+
+    async def _read_bin_wave_into(self, buf):
+        num_bytes = await self._read_block_header()
+        mv = memoryview(buf).cast('B')
+        if num_bytes > mv.nbytes:
+            error_message = f'buffer of {mv.nbytes} bytes too small for {num_bytes} byte waveform block'
+            raise InstrProtocolError(error_message)
+        await self._recv_into(mv[:num_bytes])
+        await self._skip_linefeed()
+        return num_bytes
+
+    async def _read_bin_wave(self):
+        num_bytes = await self._read_block_header()
+        wave_data = bytearray(num_bytes)
+        await self._recv_into(memoryview(wave_data))
+        await self._skip_linefeed()
+        return wave_data
+
+    async def _read_image_data(self, head=b''):     # size-free PNG/BMP read, see SocketInstr.read_image_data(), 'head' = Bytes already read
+        head += await self._readexactly(8 - len(head))
+        if head == PNG_SIGNATURE:
+            parts = [head]
+            while True:
+                chunk_head = await self._readexactly(8)
+                length, tag = struct.unpack('>I4s', chunk_head)
+                parts.append(chunk_head)
+                parts.append(await self._readexactly(length + 4))     # data and CRC
+                if tag == b'IEND':
+                    return bytearray(b''.join(parts))
+        if head[:2] == b'BM':
+            dat = bytearray(struct.unpack('<I', head[2:6])[0])
+            dat[:8] = head
+            await self._recv_into(memoryview(dat)[8:])
+            return dat
+        return None
+
+    async def _fetch_screen(self, temp_file):
+        await self._send(f'save:image "{temp_file}"')
+        await self._query('*opc?')
+        size_free = temp_file.lower().endswith(('.png', '.bmp'))
+        if not size_free:
+            r = parse_ldir(await self._query('filesystem:ldir?'))
+            a = [x for x in r if x[0] == temp_file]
+            if len(a) == 0:
+                p = await self._query('filesystem:cwd?')
+                error_message = f'file "{temp_file}" not found on scope (path: {p})'
+                raise InstrProtocolError(error_message)
+        await self._send(f'filesystem:readfile "{temp_file}"')
+        await self._send('!r')  # Flag for scope read to buffer
+        await self._send('*opc?')   # sentinel, follows the file data or arrives alone when the file is missing
+        if size_free:
+            head = await self._readexactly(2)
+            if head == b'1\n':     # PNG and BMP files never start with '1\n'
+                p = await self._query('filesystem:cwd?')
+                error_message = f'no data received for "{temp_file}", file likely not found on scope (path: {p})'
+                raise InstrProtocolError(error_message)
+            dat = await self._read_image_data(head)
+            if dat is None:
+                self._desync = True     # rest of the transfer is dropped by the next call
+                error_message = f'"{temp_file}" is not a PNG or BMP file'
+                raise InstrProtocolError(error_message)
+        else:
+            dat = await self._read_bytes(int(a[0][2]))
+        await self._skip_linefeed()
+        if (await self._read()) != '1':     # *opc? sentinel
+            error_message = 'missing *opc? reply after file data'
+            raise InstrProtocolError(error_message)
+        await self._send(f'filesystem:delete "{temp_file}"')
+        await self._query('*opc?')
+        return dat
+
+    ''' Public coroutines, same names and arguments as SocketInstr plus an optional per-call timeout '''
+
+    async def write(self, scpi, timeout=None):
+        return await self._run(self._send, scpi, timeout=timeout)
+
+    async def read(self, timeout=None):
+        return await self._run(self._read, timeout=timeout)
+
+    async def query(self, scpi, timeout=None):
+        return await self._run(self._query, scpi, timeout=timeout)
+
+    async def query_many(self, queries, timeout=None):  # one compound message, replies returned as a list in order
+        queries = list(queries)
+        if not queries:
+            return []
+        resp = split_response(await self.query(';:'.join(q.lstrip(':') for q in queries), timeout=timeout))
+        if len(resp) != len(queries):
+            error_message = f'expected {len(queries)} replies to compound query, received {len(resp)}: {resp}'
+            raise InstrProtocolError(error_message)
+        return resp
+
+    async def read_bytes(self, n_bytes, timeout=None):
+        return await self._run(self._read_bytes, n_bytes, timeout=timeout)
+
+    async def read_bin_wave(self, timeout=None):
+        return await self._run(self._read_bin_wave, timeout=timeout)
+
+    async def read_bin_wave_into(self, buf, timeout=None):
+        return await self._run(self._read_bin_wave_into, buf, timeout=timeout)
+
+    async def query_bin_wave(self, scpi='curve?', timeout=None):  # sends curve? and reads the block under one lock
+        async def _query_bin_wave():
+            await self._send(scpi)
+            return await self._read_bin_wave()
+        return await self._run(_query_bin_wave, timeout=timeout)
+
+    async def fetch_screen(self, temp_file, timeout=None):
+        return await self._run(self._fetch_screen, temp_file, timeout=timeout)
+
+    async def clear(self, timeout=None):  # behaves like pyvisa device.clear()
+        return await self._run(self._send, '!d', timeout=timeout)
@@ -0,0 +1,235 @@
+#!/usr/bin/env python
+'''
+Waveform transfer benchmark for socket_instr
+Runs against mock_scope_server.py (started in its own process) and sweeps record length,
+DATa:ENCdg (SRIBINARY, RIBINARY, ASCii) and WFMOutpre:BYT_N (1, 2).
+Each case runs in a fresh worker process so its peak RSS is not polluted by earlier cases.
+Measured per case: MB/s, time-to-first-byte and peak RSS of
+    read_bin_wave()  - binary encodings
+    read_bytes()     - binary encodings, block header parsed then raw read of the data bytes
+    read()           - ASCii encoding, curve? returned as text
+    fetch_screen()   - SAVE:IMAGe + FILESystem:READFile, swept over image size
+Results are written to a JSON file; two result files from different commits can be compared with --compare
+
+    Example:
+        python benchmark_transfer.py --out before.json
+        python benchmark_transfer.py --out after.json --records 1e3 1e6 1e8
+        python benchmark_transfer.py --compare before.json after.json
+
+    Disclaimer:
+    This program is a proof of concept and provided "As-is".
+    Its contents may be altered to suit different applications.
+
+    Tested using Python v3.10.5
+'''
+
+import argparse
+import json
+import multiprocessing
+import os
+import platform
+import queue
+import subprocess
+import sys
+import time
+from datetime import datetime
+from mock_scope_server import MockScopeServer
+from socket_instr import SocketInstr
+
+try:
+    import resource     # not available on Windows, peak RSS is then reported as None
+except ImportError:
+    resource = None
+
+RECORDS = (1e3, 1e4, 1e5, 1e6, 1e7, 1e8, 1e9)
+ENCODINGS = ('SRIBINARY', 'RIBINARY', 'ASCII')
+WIDTHS = (1, 2)
+IMAGE_SIZES = (1e5, 1e6, 4e6)
+
+
+def _peak_rss_mb():
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / 2**20 if sys.platform == 'darwin' else peak / 2**10     # Bytes on macOS, KiB on Linux
+
+
+def _serve(record, latency, bandwidth, port_queue):    # mock scope process
+    server = MockScopeServer(port=0, record_length=record, latency=latency, bandwidth=bandwidth)
+    port_queue.put(server.port)
+    server.serve_forever()
+
+
+def _serve_images(image_size, latency, bandwidth, port_queue):     # mock scope process for fetch_screen cases
+    server = MockScopeServer(port=0, latency=latency, bandwidth=bandwidth, image_size=int(image_size))
+    port_queue.put(server.port)
+    server.serve_forever()
+
+
+''' measured transfer paths, each returns the number of payload Bytes received '''
+
+
+def _read_bin_wave(scope):
+    scope.write('curve?')
+    return len(scope.read_bin_wave())
+
+
+def _read_bytes(scope):
+    scope.write('curve?')
+    n_bytes = scope.read_block_header()
+    scope.read_bytes(n_bytes + 1)   # '+1' linefeed terminating the block
+    return n_bytes
+
+
+def _read(scope):
+    return len(scope.query('curve?'))
+
+
+def _fetch_screen(scope):
+    return len(scope.fetch_screen('benchmark.png'))
+
+
+METHODS = {'read_bin_wave': _read_bin_wave, 'read_bytes': _read_bytes, 'read': _read, 'fetch_screen': _fetch_screen}
+HEADERS = {'read_bin_wave': 'CURVE?', 'read_bytes': 'CURVE?', 'read': 'CURVE?', 'fetch_screen': 'FILESYSTEM:READFILE'}
+
+
+def _run_case(port, case, repeat, result_queue):    # worker process, one benchmark case
+
+    scope = SocketInstr('127.0.0.1', port, timeout=600, stats=True)
+    with scope.batch():
+        if case['method'] == 'fetch_screen':
+            scope.write(f'filesystem:cwd {scope.query("filesystem:homedir?")}')
+        else:
+            scope.write(f'horizontal:mode:record {case["points"]}')
+            scope.write(f'data:encdg {case["encoding"]}')
+            scope.write(f'wfmoutpre:byt_n {case["byt_n"]}')
+            scope.write('data:start 1')
+            scope.write(f'data:stop {case["points"]}')
+    rss_before = _peak_rss_mb()
+    best = None
+    for _ in range(repeat):
+        scope.stats.reset()
+        t_start = time.perf_counter()
+        n_bytes = METHODS[case['method']](scope)
+        elapsed = time.perf_counter() - t_start
+        stats = scope.stats.summary().get(HEADERS[case['method']], {})
+        if best is None or elapsed < best['seconds']:
+            best = {'bytes': n_bytes, 'seconds': elapsed, 'MBps': n_bytes / elapsed / 1e6,
+                    'ttfb_s': stats.get('first_byte_s')}
+    scope.close()
+    result_queue.put(dict(case, **best, rss_before_MB=rss_before, peak_rss_MB=_peak_rss_mb()))
+
+
+def _cases(args):
+    for points in args.records:
+        for encoding in args.encodings:
+            if encoding == 'ASCII' and points > args.ascii_max_points:
+                continue    # text curve? grows ~6 Bytes/point, skipped beyond --ascii-max-points
+            for byt_n in args.widths:
+                methods = ('read',) if encoding == 'ASCII' else ('read_bin_wave', 'read_bytes')
+                for method in methods:
+                    yield {'method': method, 'encoding': encoding, 'byt_n': byt_n, 'points': points}
+    for size in args.image_sizes:
+        yield {'method': 'fetch_screen', 'encoding': 'PNG', 'byt_n': 1, 'points': size}
+
+
+def _git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', 'HEAD'], capture_output=True, text=True, check=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def _wait_result(worker, result_queue, timeout):     # (result, None) of a worker process, (None, error) if it died or ran past timeout seconds
+    deadline = time.perf_counter() + timeout
+    while True:
+        try:
+            return result_queue.get(timeout=1), None
+        except queue.Empty:
+            if not worker.is_alive():   # exception in _run_case (e.g. MemoryError), check once more for a result queued just before exit
+                try:
+                    return result_queue.get(timeout=1), None
+                except queue.Empty:
+                    worker.join()
+                    return None, f'worker exit code {worker.exitcode}'
+            if time.perf_counter() > deadline:
+                worker.terminate()
+                return None, f'timed out after {timeout:.0f} s'
+
+
+def run(args):
+    ctx = multiprocessing.get_context('spawn')  # same behavior on Windows and Linux, nothing inherited from this process
+    port_queue = ctx.Queue()
+    results = []
+    server = ctx.Process(target=_serve, args=(int(max(args.records)), args.latency, args.bandwidth, port_queue), daemon=True)
+    server.start()
+    port = port_queue.get(timeout=30)
+    try:
+        for case in _cases(args):
+            if case['method'] == 'fetch_screen':    # image size is a server setting, restart per size
+                server.terminate()
+                server = ctx.Process(target=_serve_images, args=(case['points'], args.latency, args.bandwidth, port_queue), daemon=True)
+                server.start()
+                port = port_queue.get(timeout=30)
+            result_queue = ctx.Queue()
+            worker = ctx.Process(target=_run_case, args=(port, case, args.repeat, result_queue))
+            worker.start()
+            r, error = _wait_result(worker, result_queue, args.case_timeout)
+            worker.join()
+            if r is None:   # failed case is recorded and the sweep continues
+                results.append(dict(case, error=error))
+                print(f'{case["method"]:>13} {case["encoding"]:>9} byt_n={case["byt_n"]} points={case["points"]:>10.0f} FAILED: {error}')
+                continue
+            results.append(r)
+            print(f'{r["method"]:>13} {r["encoding"]:>9} byt_n={r["byt_n"]} points={r["points"]:>10.0f} '
+                  f'{r["MBps"]:9.1f} MB/s  ttfb {r["ttfb_s"] * 1e3:7.2f} ms  peak RSS {r["peak_rss_MB"] or 0:.1f} MB')
+    finally:
+        server.terminate()
+
+    report = {'timestamp': datetime.now().isoformat(), 'commit': _git_commit(), 'python': platform.python_version(),
+              'platform': platform.platform(), 'latency': args.latency, 'bandwidth': args.bandwidth,
+              'repeat': args.repeat, 'results': results}
+    with open(args.out, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f'results saved to {args.out}')
+
+
+def compare(base_path, new_path):   # prints MB/s and peak RSS of matching cases side by side
+    with open(base_path) as f:
+        base = json.load(f)
+    with open(new_path) as f:
+        new = json.load(f)
+    key = ('method', 'encoding', 'byt_n', 'points')
+    base_results = {tuple(r[k] for k in key): r for r in base['results']}
+    print(f'base {base["commit"]}  vs  new {new["commit"]}')
+    print(f'{"method":>13} {"encoding":>9} {"byt_n":>5} {"points":>10} {"base MB/s":>10} {"new MB/s":>10} {"speedup":>8} {"base RSS":>9} {"new RSS":>9}')
+    for r in new['results']:
+        b = base_results.get(tuple(r[k] for k in key))
+        if b is None or 'error' in b or 'error' in r:   # failed cases have no measurements
+            continue
+        print(f'{r["method"]:>13} {r["encoding"]:>9} {r["byt_n"]:>5} {r["points"]:>10.0f} {b["MBps"]:10.1f} {r["MBps"]:10.1f} '
+              f'{r["MBps"] / b["MBps"]:7.2f}x {b["peak_rss_MB"] or 0:9.1f} {r["peak_rss_MB"] or 0:9.1f}')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='socket_instr waveform transfer benchmark')
+    parser.add_argument('--out', default='benchmark_transfer.json', help='JSON result file')
+    parser.add_argument('--records', type=float, nargs='+', default=RECORDS, help='record lengths in points')
+    parser.add_argument('--encodings', nargs='+', default=ENCODINGS, type=str.upper, choices=ENCODINGS)
+    parser.add_argument('--widths', type=int, nargs='+', default=WIDTHS, choices=WIDTHS, help='WFMOutpre:BYT_N values')
+    parser.add_argument('--image-sizes', type=float, nargs='*', default=IMAGE_SIZES, help='fetch_screen image sizes in Bytes')
+    parser.add_argument('--ascii-max-points', type=float, default=1e7, help='largest record benchmarked with ASCii encoding')
+    parser.add_argument('--repeat', type=int, default=3, help='runs per case, best run is reported')
+    parser.add_argument('--case-timeout', type=float, default=1800, help='seconds before a case is stopped and recorded as failed')
+    parser.add_argument('--latency', type=float, default=0.0, help='mock scope reply latency in seconds')
+    parser.add_argument('--bandwidth', type=float, default=None, help='mock scope bandwidth limit in Bytes/s')
+    parser.add_argument('--compare', nargs=2, metavar=('BASE', 'NEW'), help='compare two result files instead of running')
+    args = parser.parse_args()
+
+    if args.compare:
+        compare(*args.compare)
+    else:
+        args.records = [int(r) for r in args.records]
+        args.image_sizes = [int(r) for r in args.image_sizes]
+        run(args)
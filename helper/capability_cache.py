@@ -0,0 +1,102 @@
+#!/usr/bin/env python
+'''
+On-disk instrument capability cache keyed by *IDN? model, serial and firmware
+Stores what a script would otherwise re-discover on every run: scope series, the verified
+screenshot command set (SAVE:IMAGe vs EXPort START), home directory, the record length the scope
+set for each requested length (per number of enabled channels, scopes round to allowed lengths) and
+preferred waveform transfer settings. When the same instrument with the same firmware was seen before,
+discovery round trips are skipped (socket_curve_and_img_fetch.py skips its horizontal:recordlength?
+read back for a request seen before, and its wfmoutpre:byt_n? read back); a firmware update starts a new entry.
+The JSON file is shared with docs/tek_screenshot_capture_reference.py. update() re-reads the file and
+merges before writing, and replaces it atomically, so entries saved by other processes are kept.
+Uses only python built-in modules
+
+    Example:
+        from capability_cache import CapabilityCache, record_key
+        cache = CapabilityCache()
+        idn = scope.query('*idn?')
+        caps = cache.discover(scope, idn)       # no round trips when this scope is cached
+        scope.write(f'filesystem:cwd {caps["home"]}')
+        scope.write(f'horizontal:mode:record {record}')
+        acq_record = cache.record_length(idn, record, n_channels)   # None unless this exact request was read back before
+        if acq_record is None:
+            acq_record = int(scope.query('horizontal:recordlength?'))
+        cache.update(idn, record_lengths={record_key(record, n_channels): acq_record},
+                     transfer={'encdg': 'SRIBINARY', 'byt_n': 2})
+
+    Disclaimer:
+    This program is a proof of concept and provided "As-is".
+    Its contents may be altered to suit different applications.
+
+    Tested using Python v3.10.5
+'''
+
+import json
+import os
+import time
+
+CACHE_FILE = os.path.join(os.path.expanduser('~'), '.tek_instr_capabilities.json')
+SCREENSHOT_COMMANDS = {'mso456': 'SAVE:IMAGe', 'mso70k': 'EXPort START', 'unknown': 'SAVE:IMAGe'}
+DEFAULT_HOME = {'mso70k': '"C:/TekScope"'}  # 70k series has no FILESystem:HOMEdir?
+
+
+def idn_key(idn):   # 'TEKTRONIX,MSO58B,B025564,CF:91.1CT FV:2.20.8' -> 'MSO58B,B025564,CF:91.1CT FV:2.20.8'
+    parts = [p.strip() for p in idn.split(',')]
+    return ','.join(parts[1:4])
+
+
+def detect_series(idn):     # 'mso456', 'mso70k' or 'unknown', same rules as detect_scope_series() in the screenshot reference
+    model = idn.upper().split(',')[1].strip() if ',' in idn else ''
+    if model.startswith(('MSO7', 'DPO7')):
+        return 'mso70k'
+    if model.startswith(('MSO4', 'MSO5', 'MSO6')) or 'TEKSCOPESW' in idn.upper():
+        return 'mso456'
+    return 'unknown'
+
+
+def record_key(record, n_channels):     # 'record_lengths' key of a requested record length with n_channels enabled
+    return f'{int(record)}/{n_channels}ch'
+
+
+class CapabilityCache(object):
+    def __init__(self, path=CACHE_FILE):
+
+        self.path = path
+        self._entries = self._load()
+
+    def _load(self):
+        try:
+            with open(self.path) as f:
+                return json.load(f)
+        except (OSError, ValueError):   # missing or unreadable cache starts empty
+            return {}
+
+    def get(self, idn):     # cached capabilities of this instrument and firmware, None if never seen
+        return self._entries.get(idn_key(idn))
+
+    def record_length(self, idn, record, n_channels):   # record length the scope set for this request before, None if never read back
+        entry = self.get(idn) or {}
+        return entry.get('record_lengths', {}).get(record_key(record, n_channels))
+
+    def update(self, idn, **caps):  # merges caps into the instrument entry and saves the file, returns the entry
+
+        # the file is re-read so entries written by other processes since __init__ are merged, not overwritten
+        self._entries = self._load()
+        entry = self._entries.setdefault(idn_key(idn), {'series': detect_series(idn)})
+        if 'record_lengths' in caps:    # requested -> actual mappings are added to, not replaced
+            caps['record_lengths'] = dict(entry.get('record_lengths', {}), **caps['record_lengths'])
+        entry.update(caps, updated=time.time())
+        temp = f'{self.path}.{os.getpid()}.tmp'
+        with open(temp, 'w') as f:
+            json.dump(self._entries, f, indent=2)
+        os.replace(temp, self.path)     # atomic, readers never see a partly written file
+        return entry
+
+    def discover(self, instr, idn):    # cached entry, or one built from discovery queries on instr (SocketInstr) and saved
+
+        entry = self.get(idn)
+        if entry is not None and 'home' in entry:
+            return entry
+        series = detect_series(idn)
+        home = DEFAULT_HOME.get(series) or instr.query('filesystem:homedir?')
+        return self.update(idn, series=series, screenshot=SCREENSHOT_COMMANDS[series], home=home)
@@ -0,0 +1,243 @@
+#!/usr/bin/env python
+'''
+Chunk level summary index for fast queries over long waveform captures
+ChunkIndex keeps min, max, sum and sum of squares of every 'chunk_points' raw samples, so
+threshold, RMS and envelope queries only read the chunks that can contain an answer:
+    exceeds()   (start, stop) sample runs above (or below) a level, chunks whose max (min) cannot
+                cross the level are skipped without reading them
+    rms()       RMS of a sample region, whole chunks come from the index, only the partial chunks at
+                both ends are read
+    envelope()  min and max of a sample region, same as rms()
+Chunks are reduced as they are added, so chunks of a streaming transfer (SocketInstr.iter_curve())
+can be indexed while the next chunk is still being received. Statistics are kept in raw levels,
+volts are derived with the WFMOutpre scaling when queried.
+wave_archive.py stores the index of every record in the archive index table.
+numpy required
+
+    Example:
+        idx = ChunkIndex.from_preamble(scope.preamble('ch1'))
+        for chunk in scope.iter_curve('ch1'):
+            idx.add(chunk)
+        idx.finish()
+        runs = idx.exceeds(raw, 0.5)            # sample runs above 0.5V, raw is the stored record (e.g. np.memmap)
+        v_rms = idx.rms(raw, 10**9, 2 * 10**9)  # RMS volts of one billion samples, reads at most two chunks
+        idx.mean, idx.rms_chunks                # per chunk mean and RMS volts
+
+    Disclaimer:
+    This program is a proof of concept and provided "As-is".
+    Its contents may be altered to suit different applications.
+
+    Tested using Python v3.10.5
+'''
+
+import numpy as np      # numpy version v1.23.1
+
+CHUNK_POINTS = 1 << 16  # samples per index chunk, 8G points give 131072 chunks
+SCAN_POINTS = 1 << 22   # samples reduced or searched per step, bounds temporaries
+
+
+class ChunkIndex(object):
+    def __init__(self, chunk_points=CHUNK_POINTS, ymult=1.0, yoff=0.0, yzero=0.0):
+
+        self.chunk_points = chunk_points
+        self.ymult = ymult      # volts / level, volts = (raw - yoff) * ymult + yzero
+        self.yoff = yoff
+        self.yzero = yzero
+        self.n_points = 0       # samples indexed, including the carry
+        self.carry = None       # samples of a chunk split across add() calls
+        self._min = []          # per add() arrays of chunk minimums (raw)
+        self._max = []
+        self._sum = []
+        self._sumsq = []
+
+    @classmethod
+    def from_preamble(cls, pre, chunk_points=CHUNK_POINTS):     # scaling from a socket_instr.WaveformPreamble or wfmoutpre header dict
+        if not pre:
+            return cls(chunk_points)
+        if isinstance(pre, dict):
+            return cls(chunk_points, pre['ymult'], pre['yoff'], pre['yzero'])
+        return cls(chunk_points, pre.ymult, pre.yoff, pre.yzero)
+
+    @classmethod
+    def from_dict(cls, d, pre=None):    # index stored by to_dict(), scaled with 'pre' (preamble object or dict)
+
+        idx = cls.from_preamble(pre, d['chunk_points'])
+        idx.n_points = d['n_points']
+        idx._min = [np.array(d['min'])]
+        idx._max = [np.array(d['max'])]
+        idx._sum = [np.array(d['sum'])]
+        idx._sumsq = [np.array(d['sumsq'])]
+        return idx
+
+    @classmethod
+    def scan(cls, raw, pre=None, chunk_points=CHUNK_POINTS):    # index of a complete record (array or np.memmap)
+        idx = cls.from_preamble(pre, chunk_points)
+        idx.add(raw)
+        return idx.finish()
+
+    def _reduce(self, y):   # statistics of whole chunks of y, the last chunk may be partial
+
+        cp = self.chunk_points
+        full = len(y) // cp
+        acc = np.int64 if y.dtype.kind in 'iub' else np.float64    # exact sums for integer samples
+        if full:
+            block = y[:full * cp].reshape(full, cp)
+            self._min.append(block.min(axis=1))
+            self._max.append(block.max(axis=1))
+            self._sum.append(block.sum(axis=1, dtype=acc))
+            wide = block.astype(acc)
+            self._sumsq.append(np.einsum('ij,ij->i', wide, wide))
+        if len(y) > full * cp:
+            tail = y[full * cp:].astype(acc)
+            self._min.append(tail.min(keepdims=True))
+            self._max.append(tail.max(keepdims=True))
+            self._sum.append(tail.sum(keepdims=True))
+            self._sumsq.append(np.dot(tail, tail).reshape(1))
+
+    def add(self, chunk):   # indexes the next samples of the record, chunks must arrive in record order
+
+        chunk = np.asarray(chunk)
+        if self.carry is not None and len(self.carry):
+            fill = self.chunk_points - len(self.carry)
+            self.carry = np.concatenate((self.carry, chunk[:fill]))     # at most one index chunk is copied
+            self.n_points += min(fill, len(chunk))
+            chunk = chunk[fill:]
+            if len(self.carry) < self.chunk_points:
+                return
+            self._reduce(self.carry)
+            self.carry = None
+        whole = len(chunk) // self.chunk_points * self.chunk_points
+        step = max(1, SCAN_POINTS // self.chunk_points) * self.chunk_points
+        for start in range(0, whole, step):
+            self._reduce(chunk[start:min(start + step, whole)])
+        self.carry = chunk[whole:].copy()
+        self.n_points += len(chunk)
+
+    def finish(self):   # indexes the last partial chunk, returns self
+        if self.carry is not None and len(self.carry):
+            self._reduce(self.carry)
+        self.carry = None
+        return self
+
+    def _stats(self):   # (min, max, sum, sumsq) raw arrays, one entry per chunk
+        for name in ('_min', '_max', '_sum', '_sumsq'):
+            parts = getattr(self, name)
+            if len(parts) > 1:
+                setattr(self, name, [np.concatenate(parts)])
+        if not self._min:
+            return (np.empty(0),) * 4
+        return self._min[0], self._max[0], self._sum[0], self._sumsq[0]
+
+    def to_dict(self):  # JSON serializable raw statistics, see from_dict()
+        self.finish()
+        s_min, s_max, s_sum, s_sumsq = self._stats()
+        return {'chunk_points': self.chunk_points, 'n_points': self.n_points, 'min': s_min.tolist(),
+                'max': s_max.tolist(), 'sum': s_sum.tolist(), 'sumsq': s_sumsq.tolist()}
+
+    def __len__(self):  # number of index chunks
+        return len(self._stats()[0])
+
+    @property
+    def counts(self):   # samples per chunk
+        counts = np.full(len(self), self.chunk_points, dtype=np.int64)
+        if len(counts):
+            counts[-1] = self.n_points - (len(counts) - 1) * self.chunk_points
+        return counts
+
+    def _volts(self, raw):  # raw level(s) to volts
+        return (raw - self.yoff) * self.ymult + self.yzero
+
+    @property
+    def min(self):  # per chunk minimum volts
+        s_min, s_max = self._stats()[:2]
+        return self._volts(s_min if self.ymult >= 0 else s_max)
+
+    @property
+    def max(self):  # per chunk maximum volts
+        s_min, s_max = self._stats()[:2]
+        return self._volts(s_max if self.ymult >= 0 else s_min)
+
+    @property
+    def mean(self):     # per chunk mean volts
+        return self._volts(self._stats()[2] / self.counts)
+
+    @property
+    def rms_chunks(self):   # per chunk RMS volts
+        s_sum, s_sumsq = self._stats()[2:]
+        return self._rms(self.counts, s_sum, s_sumsq)
+
+    def _rms(self, n, s, ss):   # RMS volts from raw sample count, sum and sum of squares, v = a * raw + b
+        a = self.ymult
+        b = self.yzero - self.yoff * self.ymult
+        return np.sqrt(np.maximum(a * a * ss / n + 2 * a * b * s / n + b * b, 0.0))
+
+    def _region(self, raw, start, stop):    # raw (n, min, max, sum, sumsq) of samples [start:stop), reads partial chunks only
+
+        stop = self.n_points if stop is None else min(stop, self.n_points)
+        if not 0 <= start < stop:
+            error_message = f'empty or invalid region [{start}:{stop}) of a {self.n_points} point record'
+            raise ValueError(error_message)
+        cp = self.chunk_points
+        c0 = -(-start // cp)    # first whole chunk in the region
+        c1 = stop // cp if stop < self.n_points else len(self)     # end of whole chunks
+        parts = []
+        if c0 >= c1:    # region inside one or two chunks, read it directly
+            parts.append(raw[start:stop])
+        else:
+            parts.append(raw[start:c0 * cp])
+            parts.append(raw[c1 * cp:stop])
+        acc = np.int64 if np.dtype(raw.dtype).kind in 'iub' else np.float64
+        n, s, ss, lo, hi = 0, 0, 0, [], []
+        for p in parts:
+            if len(p):
+                p = np.asarray(p, dtype=acc)
+                n, s, ss = n + len(p), s + p.sum(), ss + np.dot(p, p)
+                lo.append(p.min())
+                hi.append(p.max())
+        if c0 < c1:
+            s_min, s_max, s_sum, s_sumsq = self._stats()
+            n += int(self.counts[c0:c1].sum())
+            s, ss = s + s_sum[c0:c1].sum(), ss + s_sumsq[c0:c1].sum()
+            lo.append(s_min[c0:c1].min())
+            hi.append(s_max[c0:c1].max())
+        return n, min(lo), max(hi), s, ss
+
+    def rms(self, raw, start=0, stop=None):     # RMS volts of samples [start:stop) of raw
+        n, _, _, s, ss = self._region(raw, start, stop)
+        return float(self._rms(n, s, ss))
+
+    def envelope(self, raw, start=0, stop=None):    # (min, max) volts of samples [start:stop) of raw
+        _, lo, hi, _, _ = self._region(raw, start, stop)
+        lo, hi = self._volts(lo), self._volts(hi)
+        return (float(lo), float(hi)) if lo <= hi else (float(hi), float(lo))
+
+    def candidates(self, level, below=False):   # chunk numbers that can hold samples above (below) level volts
+        return np.flatnonzero(self.min < level if below else self.max > level)
+
+    def exceeds(self, raw, level, below=False):     # (start, stop) sample runs of raw above (below) level volts, N x 2 array
+
+        # only candidate chunks are read, consecutive candidates are searched as one span so runs crossing
+        # chunk boundaries come out whole
+        chunks = self.candidates(level, below)
+        if not len(chunks):
+            return np.empty((0, 2), dtype=np.int64)
+        level_raw = (level - self.yzero) / self.ymult + self.yoff   # compare in raw levels, no scaling of samples
+        if self.ymult < 0:
+            below = not below
+        breaks = np.flatnonzero(np.diff(chunks) > 1)
+        span_first = chunks[np.r_[0, breaks + 1]]
+        span_last = chunks[np.r_[breaks, len(chunks) - 1]]
+        runs = []
+        for first, last in zip(span_first, span_last):
+            span_stop = min((last + 1) * self.chunk_points, self.n_points)
+            for start in range(first * self.chunk_points, span_stop, SCAN_POINTS):
+                piece = raw[start:min(start + SCAN_POINTS, span_stop)]
+                mask = piece < level_raw if below else piece > level_raw
+                edges = np.flatnonzero(np.diff(mask.view(np.int8), prepend=0, append=0))
+                if len(edges):
+                    runs.append(edges.reshape(-1, 2) + start)
+        if not runs:
+            return np.empty((0, 2), dtype=np.int64)
+        runs = np.concatenate(runs)
+        joined = np.r_[False, runs[1:, 0] == runs[:-1, 1]]     # runs split at piece boundaries continue the previous run
+        return np.column_stack((runs[~joined, 0], runs[np.r_[~joined[1:], True], 1]))
@@ -0,0 +1,140 @@
+#!/usr/bin/env python
+'''
+Peak preserving decimation for plotting 100M+ point records
+    minmax()    min and max sample of every pixel column, glitches and peaks stay visible
+    lttb()      Largest-Triangle-Three-Buckets, picks the visually most significant sample per bucket
+    preview()   a few thousand (time, volts) points of a ScaledWaveform/TimeAxis pair, ready for plt.plot()
+MinMaxAccumulator does the min/max reduction chunk by chunk, so chunks of a streaming transfer
+(SocketInstr.iter_curve()) can be reduced while the next chunk is still being received.
+Works on the raw int8/int16 samples, scaling is applied to the reduced points only.
+numpy required
+
+    Example:
+        t, v = preview(scaled_amp, scaled_time, n_columns=2000)   # 4000 points, peaks kept
+        plt.plot(t, v)
+
+        acc = MinMaxAccumulator(record, n_columns=2000)
+        for chunk in scope.iter_curve('ch1'):
+            acc.add(chunk)
+        idx, raw = acc.result()
+
+    Disclaimer:
+    This program is a proof of concept and provided "As-is".
+    Its contents may be altered to suit different applications.
+
+    Tested using Python v3.10.5
+'''
+
+import numpy as np      # numpy version v1.23.1
+
+LTTB_PREREDUCE = 8  # preview(method='lttb') reduces to LTTB_PREREDUCE x n_out min/max points before running LTTB
+
+
+class MinMaxAccumulator(object):
+    def __init__(self, n_points, n_columns):
+
+        self.column = max(1, -(-n_points // n_columns))   # samples per column, ceil(n_points / n_columns)
+        self.offset = 0         # record index of the first sample in 'carry'
+        self.carry = None       # samples of a column split across chunk boundaries
+        self._idx = []          # per chunk arrays of selected record indices
+        self._val = []          # per chunk arrays of selected sample values
+
+    def _reduce(self, y, offset):   # min and max of whole columns of y, y length is a multiple of self.column or the final remainder
+        cols = -(-len(y) // self.column)
+        if cols == 0:
+            return
+        full = len(y) // self.column
+        if full:
+            block = y[:full * self.column].reshape(full, self.column)
+            i_min = block.argmin(axis=1)
+            i_max = block.argmax(axis=1)
+            base = np.arange(full, dtype=np.int64) * self.column
+            lo = np.minimum(i_min, i_max)   # keep the pair of each column in time order
+            hi = np.maximum(i_min, i_max)
+            idx = np.empty(2 * full, dtype=np.int64)
+            idx[0::2] = base + lo
+            idx[1::2] = base + hi
+            self._idx.append(idx + offset)
+            self._val.append(y[idx])
+        if cols > full:     # final partial column
+            tail = y[full * self.column:]
+            pair = np.sort(np.array([tail.argmin(), tail.argmax()], dtype=np.int64)) + full * self.column
+            self._idx.append(pair + offset)
+            self._val.append(y[pair])
+
+    def add(self, chunk):   # reduces the next chunk of the record, chunks must arrive in record order
+
+        chunk = np.asarray(chunk)
+        start = self.offset
+        if self.carry is not None and len(self.carry):
+            fill = self.column - len(self.carry)
+            head = np.concatenate((self.carry, chunk[:fill]))   # at most one column of samples is copied
+            chunk = chunk[fill:]
+            if len(head) < self.column:
+                self.carry = head
+                return
+            self._reduce(head, start)
+            start += self.column
+        whole = len(chunk) // self.column * self.column
+        self._reduce(chunk[:whole], start)
+        self.carry = chunk[whole:].copy()
+        self.offset = start + whole
+
+    def result(self):   # (record indices, raw values) of all columns, includes the last partial column
+        if self.carry is not None and len(self.carry):
+            self._reduce(self.carry, self.offset)
+            self.offset += len(self.carry)
+            self.carry = None
+        if not self._idx:
+            return np.empty(0, dtype=np.int64), np.empty(0)
+        return np.concatenate(self._idx), np.concatenate(self._val)
+
+
+def minmax(y, n_columns):  # (indices, values) of the min and max sample of each of n_columns columns, 2 * n_columns points
+    acc = MinMaxAccumulator(len(y), n_columns)
+    acc.add(y)
+    return acc.result()
+
+
+def lttb(y, n_out, x=None):     # indices of n_out samples selected by Largest-Triangle-Three-Buckets
+
+    # first and last sample are always kept, the remaining samples are split into n_out - 2 buckets and from each
+    # bucket the sample forming the largest triangle with the previous pick and the next bucket's average is chosen.
+    # the loop runs per bucket, the work inside each bucket is vectorized
+    n = len(y)
+    if n_out >= n or n_out < 3:
+        return np.arange(n, dtype=np.int64)
+    y = np.asarray(y, dtype=np.float64)
+    x = np.arange(n, dtype=np.float64) if x is None else np.asarray(x, dtype=np.float64)
+    edges = np.linspace(1, n - 1, n_out - 1).astype(np.int64)   # bucket boundaries over samples 1 .. n-2
+    out = np.empty(n_out, dtype=np.int64)
+    out[0], out[-1] = 0, n - 1
+    a = 0
+    for b in range(n_out - 2):
+        lo, hi = edges[b], edges[b + 1]
+        nxt_lo, nxt_hi = hi, edges[b + 2] if b + 2 < len(edges) else n
+        avg_x = x[nxt_lo:nxt_hi].mean()
+        avg_y = y[nxt_lo:nxt_hi].mean()
+        area = np.abs((x[a] - avg_x) * (y[lo:hi] - y[a]) - (x[a] - x[lo:hi]) * (avg_y - y[a]))
+        a = lo + int(area.argmax())
+        out[b + 1] = a
+    return out
+
+
+def preview(wave, time_axis, n_columns=2000, method='minmax'):    # (times, volts) of a ScaledWaveform/TimeAxis pair reduced for plotting
+
+    # method='minmax' returns 2 * n_columns points, method='lttb' returns n_columns points.
+    # large records are min/max reduced first so LTTB only runs on LTTB_PREREDUCE * n_columns points
+    raw = wave.raw
+    if method == 'minmax':
+        idx, _ = minmax(raw, n_columns)
+    elif method == 'lttb':
+        if len(raw) > LTTB_PREREDUCE * n_columns:
+            idx, val = minmax(raw, LTTB_PREREDUCE * n_columns // 2)
+            idx = idx[lttb(val, n_columns, idx)]
+        else:
+            idx = lttb(raw, n_columns)
+    else:
+        error_message = f'unknown decimation method {method!r}, use "minmax" or "lttb"'
+        raise ValueError(error_message)
+    return time_axis.time(idx), wave[idx]
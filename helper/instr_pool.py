@@ -0,0 +1,116 @@
+#!/usr/bin/env python
+'''
+Process-wide session pool for SocketInstr connections
+Keeps persistent connections keyed by (host, port) so repeated captures pay the TCP connect
+and *IDN? identification cost once instead of on every call.
+Idle connections are health checked with a cheap *OPC? probe before reuse, broken ones are
+reconnected, and the number of idle connections kept open is capped. A connection released with
+unread reply data (buffered, already received or an open batch()) is closed instead of pooled, so a
+stale reply is never handed to the next user.
+Meant for code that connects per call (e.g. a capture function called from many places);
+ScreenshotService and socket_curve_and_img_fetch.py keep one SocketInstr open for their whole run
+and do not use it.
+Uses only python built-in modules, plus socket_instr.py in CWD
+
+    Example:
+        from instr_pool import pool
+        with pool.session('192.168.1.10', 4000) as scope:
+            print(scope.idn)
+            img = scope.fetch_screen('temp.png')
+
+    Disclaimer:
+    This program is a proof of concept and provided "As-is".
+    Its contents may be altered to suit different applications.
+
+    Tested using Python v3.10.5
+'''
+
+import select
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from socket_instr import SocketInstr, SocketInstrError  # socket_instr module required, include socket_instr.py in CWD
+
+
+class InstrPool(object):
+    def __init__(self, max_idle=8, probe_after=2.0, probe_timeout=2.0, timeout=10):
+
+        self.max_idle = max_idle            # idle connections kept open across all endpoints
+        self.probe_after = probe_after      # seconds idle before a connection is health checked on reuse
+        self.probe_timeout = probe_timeout  # seconds allowed for the *OPC? probe reply
+        self.timeout = timeout              # socket timeout of new connections
+        self._idle = OrderedDict()          # (host, port, id) -> (SocketInstr, time released), oldest first
+        self._lock = threading.Lock()
+
+    def _healthy(self, instr):  # *OPC? round trip on an idle connection, False if the instrument does not answer
+
+        try:
+            instr.socket.settimeout(self.probe_timeout)
+            ok = instr.query('*opc?') == '1'
+            instr.socket.settimeout(self.timeout)
+            return ok
+        except SocketInstrError:    # timeout, reset or garbled reply, treat as a dead connection
+            return False
+
+    def _discard(self, instr):
+        instr.close()
+
+    def _in_sync(self, instr):  # False if the connection holds reply data nobody read, or commands not yet sent
+
+        if instr._rbuf or instr._batch is not None:
+            return False
+        try:
+            readable, _, _ = select.select([instr.socket], [], [], 0)   # reply (or close) already received by the OS
+        except (OSError, ValueError):   # socket already closed
+            return False
+        return not readable
+
+    def acquire(self, host, port):  # returns a connected SocketInstr for host:port, reusing an idle one when possible
+
+        while True:
+            with self._lock:
+                key = next((k for k in self._idle if k[:2] == (host, port)), None)
+                if key is None:
+                    break
+                instr, released = self._idle.pop(key)
+            if time.time() - released < self.probe_after or self._healthy(instr):
+                return instr
+            self._discard(instr)    # stale connection, try the next idle one or reconnect
+        instr = SocketInstr(host, port, timeout=self.timeout)
+        instr.idn = instr.query('*idn?')    # identification is paid once per connection
+        return instr
+
+    def release(self, instr):   # returns a connection to the pool, closes the oldest idle one beyond max_idle
+
+        if not self._in_sync(instr):    # an unread reply would answer the next user's query
+            self._discard(instr)
+            return
+        with self._lock:
+            self._idle[(instr.host, instr.port, id(instr))] = (instr, time.time())
+            evicted = []
+            while len(self._idle) > self.max_idle:
+                evicted.append(self._idle.popitem(last=False)[1][0])
+        for old in evicted:
+            self._discard(old)
+
+    @contextmanager
+    def session(self, host, port):  # acquire/release as a context manager, connection is dropped if the block fails
+
+        instr = self.acquire(host, port)
+        try:
+            yield instr
+        except BaseException:
+            self._discard(instr)    # response state unknown, do not hand this connection out again
+            raise
+        self.release(instr)
+
+    def close_all(self):    # closes every idle connection
+        with self._lock:
+            idle = [v[0] for v in self._idle.values()]
+            self._idle.clear()
+        for instr in idle:
+            self._discard(instr)
+
+
+pool = InstrPool()  # process-wide default pool
@@ -0,0 +1,391 @@
+#!/usr/bin/env python
+'''
+Simulated Tektronix oscilloscope socket server for transport benchmarking and regression tests
+Answers on the raw socket protocol SocketInstr expects, so the helper scripts can run on a
+machine with no hardware or TekscopeSW install:
+    *IDN?, *OPC?, *OPC, *ESR?, *CLS, ALLEV?, HEADer, VERBose
+    HORizontal:RECOrdlength, HORizontal:MODE:RECOrd, DATa:SOUrce/STARt/STOP/ENCdg/WIDth
+    WFMOutpre? and WFMOutpre:<field>?, CURVe? (IEEE 488.2 definite length block, or ASCii)
+    SAVE:IMAGe, FILESystem:CWD/HOMEdir/LDIR?/READFile/DELEte
+    !d (device clear) and !r (read to buffer) flags
+Any other set command is stored and returned by its query form.
+Record length, reply latency and bandwidth are configurable, drop_after cuts the connection once for fault tests.
+Uses only python built-in modules
+
+    Example:
+        python mock_scope_server.py --port 4000 --record 10000000 --latency 0.001 --bandwidth 100e6
+
+        from mock_scope_server import MockScopeServer
+        server = MockScopeServer(port=0).start()     # port 0 picks a free port, see server.port
+        scope = SocketInstr('127.0.0.1', server.port)
+        ...
+        server.stop()
+
+    Disclaimer:
+    This program is a proof of concept and provided "As-is".
+    Its contents may be altered to suit different applications.
+
+    Tested using Python v3.10.5
+'''
+
+import argparse
+import math
+import os
+import re
+import socket
+import socketserver
+import struct
+import threading
+import time
+import zlib
+
+
+# long form mnemonics, upper case part is the accepted short form
+MNEMONICS = ('ACQuire', 'ALLEv', 'BN_Fmt', 'BYT_Nr', 'BYT_Or', 'CURVe', 'CWD', 'DATa', 'DELEte', 'DISplay',
+             'ENCdg', 'EXPort', 'FILEName', 'FILESystem', 'GLObal', 'HEADer', 'HOMEdir', 'HORizontal', 'IMAGe',
+             'LDIR', 'MODe', 'NR_Pt', 'PT_Off', 'READFile', 'RECOrd', 'RECOrdlength', 'SAVe', 'SOUrce', 'STARt',
+             'STATE', 'STOP', 'STOPAfter', 'VERBose', 'WAVEform', 'WFMOutpre', 'WIDth', 'XINcr', 'XUNit', 'XZEro',
+             'YMUlt', 'YOFf', 'YUNit', 'YZEro')
+_SHORT = {re.sub('[a-z]', '', m): m.upper() for m in MNEMONICS}
+_LONG = {m.upper(): m.upper() for m in MNEMONICS}
+
+PREAMBLE_FIELDS = ('BYT_NR', 'BIT_NR', 'ENCDG', 'BN_FMT', 'BYT_OR', 'WFID', 'NR_PT', 'PT_FMT', 'PT_ORDER',
+                   'XUNIT', 'XINCR', 'XZERO', 'PT_OFF', 'YUNIT', 'YMULT', 'YOFF', 'YZERO')
+
+
+def canonical(header):  # 'wfmo:byt_n' -> 'WFMOUTPRE:BYT_NR', 'ch1:sca' -> 'CH1:SCA' (unknown mnemonics kept as sent)
+
+    query = header.endswith('?')
+    out = []
+    for token in header.rstrip('?').strip(':').upper().split(':'):
+        m = re.match(r'^(\*?[A-Z_]+?)(\d*)$', token)
+        if m is None:
+            out.append(token)
+            continue
+        name, suffix = m.groups()
+        long = _LONG.get(name) or _SHORT.get(name) or next((v for k, v in _SHORT.items() if name.startswith(k) and v.startswith(name)), name)
+        out.append(long + suffix)
+    return ':'.join(out) + ('?' if query else '')
+
+
+class MockScopeServer(socketserver.ThreadingTCPServer):
+
+    allow_reuse_address = True
+    daemon_threads = True
+
+    def __init__(self, host='127.0.0.1', port=4000, record_length=1000000, latency=0.0, bandwidth=None,
+                 model='MSO58B', serial='MOCK0001', firmware='2.20.8', image_size=200000, drop_after=None):
+
+        super().__init__((host, port), _Handler)
+        self.port = self.server_address[1]
+        self.latency = latency          # seconds added before every query reply
+        self.bandwidth = bandwidth      # reply throttle in Bytes/s, None = unthrottled
+        self.image_size = image_size    # approximate size of images written by SAVE:IMAGe
+        self.drop_after = drop_after    # reply Bytes sent before the connection is cut once, for resume tests
+        self.idn = f'TEKTRONIX,{model},{serial},CF:91.1CT FV:{firmware}'
+        self.lock = threading.Lock()
+        self.home = 'C:/Users/Public/Tektronix/TekScope'
+        self.files = {}                 # full path -> file contents
+        self.settings = {}              # canonical header -> value of every other set command
+        self.state = {'RECORD': record_length, 'SOURCE': 'CH1', 'START': 1, 'STOP': record_length,
+                      'ENCDG': 'SRIBINARY', 'BYT_NR': 1, 'HEADER': False, 'VERBOSE': True, 'ESR': 0, 'CWD': self.home}
+        self.events = []
+
+    def start(self):    # serves from a background thread, returns self
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+    ''' waveform synthesis '''
+
+    def window(self):   # (first, last) data points returned by curve?, clipped to the record
+        record = self.state['RECORD']
+        first = min(max(1, self.state['START']), record)
+        last = min(max(first, self.state['STOP']), record)
+        return first, last
+
+    def sample_format(self):    # struct format of one sample for the current encoding and width
+        enc = self.state['ENCDG']
+        order = '>' if enc in ('RIBINARY', 'RPBINARY') else '<'
+        kind = 'B' if enc in ('RPBINARY', 'SRPBINARY') else 'b'
+        return order + (kind if self.state['BYT_NR'] == 1 else kind.replace('b', 'h').replace('B', 'H'))
+
+    def period(self):   # one period (1000 points) of the test sine as integer levels
+        amp = 100 if self.state['BYT_NR'] == 1 else 25600
+        offset = 0 if self.state['ENCDG'] not in ('RPBINARY', 'SRPBINARY') else (128 if self.state['BYT_NR'] == 1 else 32768)
+        return [int(round(amp * math.sin(2 * math.pi * i / 1000))) + offset for i in range(1000)]
+
+    def curve_chunks(self, first, last):    # yields sample Bytes of points first..last without building the whole record
+        fmt = self.sample_format()
+        width = struct.calcsize(fmt)
+        period = self.period()
+        pattern = struct.pack(f'{fmt[0]}{len(period)}{fmt[1]}', *period)
+        tile = pattern * max(1, (1 << 20) // len(pattern))  # ~1MB of whole periods
+        tile_pts = len(tile) // width
+        pos = (first - 1) % len(period)
+        n = last - first + 1
+        while n:
+            k = min(n, tile_pts - pos)
+            yield tile[pos * width:(pos + k) * width]
+            n -= k
+            pos = 0
+
+    def preamble(self):     # WFMOutpre field values for the current data window
+        first, last = self.window()
+        binary = self.state['ENCDG'] != 'ASCII'
+        lsb = self.state['ENCDG'] in ('SRIBINARY', 'SRPBINARY')
+        record = self.state['RECORD']
+        return {
+            'BYT_NR': self.state['BYT_NR'], 'BIT_NR': 8 * self.state['BYT_NR'],
+            'ENCDG': 'BINARY' if binary else 'ASCII',
+            'BN_FMT': 'RP' if self.state['ENCDG'] in ('RPBINARY', 'SRPBINARY') else 'RI',
+            'BYT_OR': 'LSB' if lsb else 'MSB',
+            'WFID': f'"{self.state["SOURCE"].capitalize()}, DC coupling, 100.0mV/div, 4.000us/div, {record} points, Sample mode"',
+            'NR_PT': last - first + 1, 'PT_FMT': 'Y', 'PT_ORDER': 'LINEAR', 'XUNIT': '"s"',
+            'XINCR': 3.2e-10, 'XZERO': -1.25e-11, 'PT_OFF': max(0, record // 2 - (first - 1)),
+            'YUNIT': '"V"', 'YMULT': 0.01 / (1 if self.state['BYT_NR'] == 1 else 256), 'YOFF': 0.0, 'YZERO': 0.0,
+        }
+
+    def png(self):  # decodable noise image of roughly image_size Bytes
+        width = 640
+        height = max(1, self.image_size // (width * 3 + 1))
+        raw = b''.join(b'\x00' + os.urandom(width * 3) for _ in range(height))
+
+        def chunk(tag, data):
+            return struct.pack('>I', len(data)) + tag + data + struct.pack('>I', zlib.crc32(tag + data) & 0xffffffff)
+        return (b'\x89PNG\r\n\x1a\n' + chunk(b'IHDR', struct.pack('>IIBBBBB', width, height, 8, 2, 0, 0, 0))
+                + chunk(b'IDAT', zlib.compress(raw, 1)) + chunk(b'IEND', b''))
+
+    ''' command execution '''
+
+    def path(self, name):   # scope side absolute path of a quoted file argument
+        name = name.strip().strip('"')
+        if re.match(r'^([A-Za-z]:)?/', name):
+            return name
+        return f'{self.state["CWD"].rstrip("/")}/{name}'
+
+    def error(self, code, text):
+        self.state['ESR'] |= 16     # execution error bit
+        self.events.append(f'{code},"{text}"')
+
+    def execute(self, line, reply):     # runs one received message, reply(bytes) sends part of the response
+
+        parts = []
+        root = ''
+        for cmd in line.split(';'):
+            cmd = cmd.strip()
+            if not cmd:
+                continue
+            header, _, arg = cmd.partition(' ')
+            if header.startswith('*') or header.startswith(':'):
+                key = canonical(header)
+            else:
+                key = canonical(f'{root}:{header}' if root else header)   # relative to previous header path
+            if not header.startswith('*'):
+                root = key.rstrip('?').rsplit(':', 1)[0] if ':' in key else ''
+            with self.lock:
+                r = self.command(key, arg.strip())
+            if r is not None:
+                if self.state['HEADER'] and isinstance(r, str) and not key.startswith('*') and not r.startswith(':'):
+                    r = f':{key.rstrip("?")} {r}'
+                parts.append(r)
+        if not parts:
+            return
+        if self.latency:
+            time.sleep(self.latency)
+        for i, r in enumerate(parts):
+            if i:
+                reply(b';')
+            if isinstance(r, str):
+                reply(r.encode('latin_1'))
+            else:   # generator of Bytes (curve? or file data)
+                for chunk in r:
+                    reply(chunk)
+        reply(b'\n')
+
+    def command(self, key, arg):    # returns str / Bytes generator for queries, None for set commands
+
+        s = self.state
+        query = key.endswith('?')
+        key = key.rstrip('?')
+        if key == '*IDN':
+            return self.idn
+        if key == '*OPC':
+            if query:
+                return '1'
+            s['ESR'] |= 1   # operation complete bit, every command of the mock completes immediately
+            return None
+        if key == '*ESR':
+            esr, s['ESR'] = s['ESR'], 0
+            return str(esr)
+        if key == '*CLS':
+            s['ESR'] = 0
+            self.events.clear()
+            return None
+        if key == 'ALLEV':
+            ev = ','.join(self.events) or '0,"No events to report - queue empty"'
+            self.events.clear()
+            return ev
+        if key in ('HEADER', 'VERBOSE'):
+            if query:
+                return '1' if s[key] else '0'
+            s[key] = arg.upper() in ('1', 'ON')
+            return None
+        if key in ('HORIZONTAL:RECORDLENGTH', 'HORIZONTAL:MODE:RECORD', 'HORIZONTAL:MODE:RECORDLENGTH'):
+            if query:
+                return str(s['RECORD'])
+            s['RECORD'] = int(float(arg))
+            return None
+        if key in ('DATA:SOURCE', 'DATA:START', 'DATA:STOP', 'DATA:ENCDG'):
+            field = key.split(':')[1]
+            if query:
+                return str(s[field])
+            if field in ('START', 'STOP'):
+                s[field] = int(float(arg))
+            elif field == 'ENCDG':
+                s[field] = 'ASCII' if arg.upper().startswith('ASC') else arg.upper()
+            else:
+                s[field] = arg.upper()
+            return None
+        if key in ('DATA:WIDTH', 'WFMOUTPRE:BYT_NR'):
+            if query:
+                return str(s['BYT_NR'])
+            s['BYT_NR'] = 2 if int(float(arg)) == 2 else 1
+            return None
+        if key == 'WFMOUTPRE' and query:
+            pre = self.preamble()
+            if s['HEADER']:
+                return ':WFMOUTPRE:' + ';'.join(f'{k} {pre[k]}' for k in PREAMBLE_FIELDS)
+            return ';'.join(str(pre[k]) for k in PREAMBLE_FIELDS)
+        if key.startswith('WFMOUTPRE:') and query:
+            field = key.split(':', 1)[1]
+            field = {'BYT_N': 'BYT_NR', 'NR_P': 'NR_PT', 'PT_O': 'PT_OFF', 'BYT_O': 'BYT_OR', 'BN_F': 'BN_FMT'}.get(field, field)
+            pre = self.preamble()
+            return str(pre[field]) if field in pre else '0'
+        if key == 'CURVE' and query:
+            first, last = self.window()
+            if s['ENCDG'] == 'ASCII':
+                return self.curve_ascii(first, last)
+            n = (last - first + 1) * s['BYT_NR']
+            return self.block(n, self.curve_chunks(first, last))
+        if key == 'FILESYSTEM:HOMEDIR':
+            return f'"{self.home}"'
+        if key == 'FILESYSTEM:CWD':
+            if query:
+                return f'"{s["CWD"]}"'
+            s['CWD'] = arg.strip('"').rstrip('/') or self.home
+            return None
+        if key == 'FILESYSTEM:LDIR' and query:
+            cwd = s['CWD'].rstrip('/') + '/'
+            entries = [f'"{p[len(cwd):]};FILE;{len(d)};2024-04-04;11:51:23"' for p, d in sorted(self.files.items())
+                       if p.startswith(cwd) and '/' not in p[len(cwd):]]
+            return ','.join(entries) or '""'
+        if key == 'FILESYSTEM:READFILE':
+            data = self.files.get(self.path(arg))
+            if data is None:
+                self.error(221, 'Settings conflict; file not found')
+                return None
+            return iter((data,))    # raw file contents, no block header
+        if key == 'FILESYSTEM:DELETE':
+            if self.files.pop(self.path(arg), None) is None:
+                self.error(221, 'Settings conflict; file not found')
+            return None
+        if key == 'SAVE:IMAGE' and not query:
+            self.files[self.path(arg)] = self.png()
+            return None
+        if query:
+            return self.settings.get(key, '0')
+        self.settings[key] = arg
+        return None
+
+    def block(self, n_bytes, chunks):   # IEEE 488.2 definite length block around a Bytes generator
+        length = str(n_bytes)
+        yield f'#{len(length)}{length}'.encode('latin_1')
+        yield from chunks
+
+    def curve_ascii(self, first, last):     # comma separated integer levels, streamed in chunks
+        period = [str(v) for v in self.period()]
+        pos = (first - 1) % len(period)
+        n = last - first + 1
+        while n:
+            k = min(n, len(period) - pos)
+            text = ','.join(period[pos:pos + k])
+            n -= k
+            yield (text + (',' if n else '')).encode('latin_1')
+            pos = 0
+
+
+class _Handler(socketserver.BaseRequestHandler):
+
+    def handle(self):
+        server = self.server
+        conn = self.request
+        conn.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)    # header, data and linefeed go out as separate sends
+        buf = bytearray()
+        sent = [0, time.perf_counter()]     # Bytes sent, start of throttle window
+
+        def reply(data):
+            if server.drop_after is not None:   # fault injection, connection is cut once drop_after reply Bytes were sent
+                if len(data) >= server.drop_after:
+                    conn.sendall(data[:server.drop_after])
+                    server.drop_after = None
+                    raise ConnectionAbortedError('mock scope dropped connection')
+                server.drop_after -= len(data)
+            if not server.bandwidth:
+                conn.sendall(data)
+                return
+            mv = memoryview(data)
+            for i in range(0, len(mv), 65536):
+                conn.sendall(mv[i:i + 65536])
+                sent[0] += len(mv[i:i + 65536])
+                ahead = sent[0] / server.bandwidth - (time.perf_counter() - sent[1])
+                if ahead > 0:
+                    time.sleep(ahead)
+
+        while True:
+            try:
+                data = conn.recv(65536)
+            except OSError:
+                return
+            if not data:
+                return
+            buf += data
+            while True:
+                eol = buf.find(b'\n')
+                if eol < 0:
+                    break
+                line = buf[:eol].decode('latin_1').strip()
+                del buf[:eol + 1]
+                if line == '!d':        # device clear, nothing is queued so only status is reset
+                    server.state['ESR'] = 0
+                elif line == '!r' or not line:
+                    pass
+                else:
+                    sent[:] = [0, time.perf_counter()]
+                    try:
+                        server.execute(line, reply)
+                    except OSError:     # client went away or injected drop
+                        return
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Simulated Tektronix scope socket server')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=4000)
+    parser.add_argument('--record', type=int, default=1000000, help='record length in points')
+    parser.add_argument('--latency', type=float, default=0.0, help='seconds added before every query reply')
+    parser.add_argument('--bandwidth', type=float, default=None, help='reply throttle in Bytes/s')
+    parser.add_argument('--image-size', type=int, default=200000, help='approximate SAVE:IMAGe file size in Bytes')
+    parser.add_argument('--drop-after', type=int, default=None, help='cut the connection once after this many reply Bytes')
+    args = parser.parse_args()
+
+    server = MockScopeServer(args.host, args.port, record_length=args.record, latency=args.latency,
+                             bandwidth=args.bandwidth, image_size=args.image_size, drop_after=args.drop_after)
+    print(f'Mock scope listening on {args.host}:{server.port} ({server.idn})')
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        server.server_close()
@@ -0,0 +1,130 @@
+#!/usr/bin/env python
+'''
+Batch screenshot capture service for Tek 4/5/6 series oscilloscopes
+Keeps one persistent SocketInstr connection, resolves the scope home directory once and
+reuses a single temp file on the scope, so each capture costs only SAVE:IMAGe, *OPC? and
+FILESystem:READFile. Finished images are handed to a bounded background writer thread so disk
+writes overlap the next capture, and *ESR?/ALLEv? error checks run every 'check_every' captures.
+Uses only python built-in modules, plus socket_instr.py in CWD
+
+    Example:
+        from screenshot_service import ScreenshotService
+        with ScreenshotService('192.168.1.10', out_dir='captures') as svc:
+            for _ in range(100):
+                svc.capture()
+            print(svc.rate(), 'images/s')
+
+    Disclaimer:
+    This program is a proof of concept and provided "As-is".
+    Its contents may be altered to suit different applications.
+
+    Tested using Python v3.10.5
+'''
+
+import os
+import queue
+import threading
+import time
+from datetime import datetime
+from socket_instr import SocketInstr, InstrProtocolError  # socket_instr module required, include socket_instr.py in CWD
+from capability_cache import CapabilityCache
+
+
+class ScreenshotService(object):
+    def __init__(self, host, port=4000, out_dir='.', temp_file='temp.png', queue_size=8, check_every=10, timeout=20):
+
+        self.out_dir = out_dir
+        self.temp_file = temp_file          # reused on the scope for every capture, deleted by close()
+        self.check_every = check_every      # captures between *esr? error checks, 0 disables periodic checks
+        self.count = 0                      # images captured
+        self.events = []                    # allev? replies of checks that found errors
+        self._queue = queue.Queue(maxsize=queue_size)  # bounds images held in memory while the disk catches up
+        self._write_error = None
+        self._t_start = None
+        self._last_timestamp = None
+
+        self.scope = SocketInstr(host, port, timeout=timeout)
+        self.scope.clear()
+        self.scope.write('*cls')    # clears event status register
+        idn = self.scope.query('*idn?')
+        self.model, self.serial = idn.split(',')[1:3]
+        self.caps = CapabilityCache().discover(self.scope, idn)  # cached per model/serial/firmware, see capability_cache.py
+        self.home = self.caps['home']   # resolved once, not per capture
+        self.scope.write(f'filesystem:cwd {self.home}')
+        os.makedirs(out_dir, exist_ok=True)
+        self._writer = threading.Thread(target=self._write_loop, name='screenshot-writer', daemon=True)
+        self._writer.start()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _write_loop(self):  # background thread, writes queued (path, data) pairs until a None sentinel arrives
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+            path, data = item
+            try:
+                with open(path, 'wb') as f:
+                    f.write(data)
+            except OSError as e:
+                self._write_error = e   # reported by the next capture() or close()
+
+    def _filename(self):    # model_serial_YYYYMMDD_HHMMSS.XX.png, capture number appended when two land in the same 10ms
+        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S.%f')[:-4]
+        if timestamp == self._last_timestamp:
+            timestamp = f'{timestamp}_{self.count}'
+        else:
+            self._last_timestamp = timestamp
+        name = f'{self.model}_{self.serial}_{timestamp}{os.path.splitext(self.temp_file)[1]}'
+        return os.path.join(self.out_dir, name)
+
+    def check_errors(self):     # returns the allev? reply when the event status register flags an error, else None
+
+        esr = int(self.scope.query('*esr?'))
+        if esr & 0b00111100:    # query, device dependent, execution and command error bits
+            events = self.scope.query('allev?')    # also clears the EVMsg? queue
+            self.events.append(events)
+            return events
+        return None
+
+    def capture(self, path=None):   # fetches one screenshot, queues it for writing and returns the local path
+
+        if self._write_error is not None:
+            raise self._write_error
+        if self._t_start is None:
+            self._t_start = time.perf_counter()
+        data = self.scope.fetch_screen(self.temp_file, delete=False)
+        path = path or self._filename()
+        self._queue.put((path, data))   # blocks only when queue_size images are waiting for the disk
+        self.count += 1
+        if self.check_every and self.count % self.check_every == 0:
+            events = self.check_errors()
+            if events is not None:
+                error_message = f'scope reported errors after capture {self.count}: {events}'
+                raise InstrProtocolError(error_message)
+        return path
+
+    def capture_many(self, n):  # captures n screenshots back to back, returns their local paths
+        return [self.capture() for _ in range(n)]
+
+    def rate(self):     # sustained captures per second since the first capture
+        if not self.count:
+            return 0.0
+        return self.count / (time.perf_counter() - self._t_start)
+
+    def close(self):    # waits for pending disk writes, deletes the scope temp file and closes the connection
+
+        self._queue.put(None)
+        self._writer.join()
+        try:
+            if self.count:
+                self.scope.write(f'filesystem:delete "{self.temp_file}"')
+                self.scope.query('*opc?')
+        finally:
+            self.scope.close()
+        if self._write_error is not None:
+            raise self._write_error
@@ -19,116 +19,133 @@
 import numpy as np      # numpy version v1.23.1
 import time
 from socket_instr import SocketInstr  # socket_instr module required, include socket_instr.py in CWD
+from capability_cache import CapabilityCache, record_key
+from waveform import ScaledWaveform, TimeAxis
+from decimate import preview
+from wave_archive import WaveArchive
 
 # user preferences
-plots = False        # set False to disable plots, program is slow to plot 100M+ sample waveforms, uses matplotlib
-save2file = True   # Set True to enable scaled waveform data and timing information save to file
+plots = False        # set False to disable plots, uses matplotlib. Records are min/max decimated to plot_columns pixel columns
+plot_columns = 2000  # horizontal resolution of the decimated plot, peaks are kept per column (see decimate.py)
+save2file = True   # Set True to save raw waveform data of every channel with its scaling and timing information to test.twa (see wave_archive.py)
+profile = False      # Set True to record per command latency/throughput, saved to transfer_stats.csv in CWD
+capture2file = False  # Set True to receive curve data directly into the memory mapped archive test.twa instead of RAM
 save_img = False     # fetches a screen grab from scope
 chan_sel = [1]        # selected channels/sources to acquire waveform data
+record = 750000000    # requested record length
+byt_n = 2             # Bytes per sample, 1 or 2 for analog channels
 
 
 def chan_state(self, sources, enable):  # Enables or disables selected channels
     n = 1 if enable else 0
-    for i in sources:
-        self.write(f"disp:glob:ch{i}:state {n}")
+    with self.batch(sync=False):    # all channel states leave in one send
+        for i in sources:
+            self.write(f"disp:glob:ch{i}:state {n}")
     return(int(self.query('*opc?')))
 
 
-def horiz_scale(self):
-    pre_trig_record = int(self.query('wfmoutpre:pt_off?'))
-    t_scale = float(self.query('wfmoutpre:xincr?'))
-    t_sub = float(self.query('wfmoutpre:xzero?'))  # sub-sample trigger correction
-    total_time = t_scale * acq_record
-    t_start = (-pre_trig_record * t_scale) + t_sub
-    t_stop = t_start + total_time
-    scaled_time = np.linspace(t_start, t_stop, num=acq_record, endpoint=False)
+def horiz_scale(self, source, n_points):
+    pre = self.preamble(source)     # one WFMOutpre? round trip for all fields, cached per source
+    # t[n] = xzero + (n - pt_off) * xincr, xzero includes sub-sample trigger correction
+    scaled_time = TimeAxis.from_preamble(pre, n_points)  # implicit axis, to_array() materializes only when needed
     return(scaled_time)
 
 
-def vert_scale(self, bin_wfm):
+def vert_scale(self, source, bin_wfm):
     # retrieve scaling factors for scaled wave plot
-    # this only applies to SRIBINARY, signed ints
-    r = int(scope.query('wfmoutpre:byt_n?'))
-    if(r == 1):        # 'h' signed 2-Byte int, 'b' signed 1-Byte int. C-struct data type formats: https://docs.python.org/3/library/struct.html#format-characters
-        d_typ = 'b'
-    elif(r == 2):
-        d_typ = 'h'
-    bin_wfm = np.frombuffer(bin_wfm, dtype=d_typ)  # converts raw byte array to np array for easier handling
-    v_scale = float(self.query('wfmoutpre:ymult?'))  # volts / level
-    v_off = float(self.query('wfmoutpre:yzero?'))  # reference voltage
-    v_pos = float(self.query('wfmoutpre:yoff?'))  # reference position (level)
-
-    # vertical (voltage)
-    unscaled_amp = np.array(bin_wfm, dtype='double')  # data type conversion
-    scaled_amp = (unscaled_amp - v_pos) * v_scale + v_off
+    # dtype follows wfmoutpre:byt_n/bn_fmt/byt_or, SRIBINARY = signed ints LSB first
+    pre = self.preamble(source)     # same cached preamble as horiz_scale(), no extra round trip
+    bin_wfm = np.frombuffer(bin_wfm, dtype=pre.dtype)  # views raw buffer as np array, no copy
+
+    # vertical (voltage), scaled lazily per slice. to_array('float32') or to_array(out=...) for the full record
+    scaled_amp = ScaledWaveform.from_preamble(bin_wfm, pre)
     return(scaled_amp)
 
 
 """     Main Application    """
 if __name__ == "__main__":
 
-    scope = SocketInstr('127.0.0.1', 4000, timeout=20)  # Scope IP, Default port = 4000
+    scope = SocketInstr('127.0.0.1', 4000, timeout=20, stats=profile)  # Scope IP, Default port = 4000
     scope.clear()
     scope.write('*cls')         # clears event status register
 
-    ID = scope.query('*idn?').split(',')
+    idn = scope.query('*idn?')
+    ID = idn.split(',')
     model = ID[1]
     serial = ID[2]
     print(f'Connected to: {model}, {serial}')
+    cache = CapabilityCache()
+    caps = cache.discover(scope, idn)   # series, home directory, ... from disk when this scope and firmware were seen before
     chan_state(scope, chan_sel, True)    # False, disables selected channels
-    scope.query('*opc?')
-
-    # scope setup
-    scope.write('display:waveform OFF')     # turn off on-screen waveform traces for faster transfers, not necessary for <100k points
-    scope.write('horizontal:mode MAN')             # manual horizontal mode for record length setting
-    scope.query('*opc?')
 
-    scope.write('horizontal:mode:record 750000000')  # set record length
-    scope.write('acquire:stopafter RUNStop')        # Run/Stop not reliant on trigger, for demo purposes
-    scope.write('acquire:state ON')
-    scope.query('*opc?')
+    # scope setup, set commands are coalesced into one send with a single *opc? sync at the end of each block
+    with scope.batch():
+        scope.write('display:waveform OFF')     # turn off on-screen waveform traces for faster transfers, not necessary for <100k points
+        scope.write('horizontal:mode MAN')             # manual horizontal mode for record length setting
+        scope.write(f'horizontal:mode:record {record}')  # set record length
+        scope.write('acquire:stopafter RUNStop')        # Run/Stop not reliant on trigger, for demo purposes
+        scope.write('acquire:state ON')
 
     # curve configuration, queries entire record
-    scope.write('data:encdg SRIBINARY')                 # signed integer, may need to modify program for other encoding schemes
-    scope.write('data:start 1')
-    acq_record = int(scope.query('horizontal:recordlength?'))
-    scope.write('data:stop {}'.format(acq_record))
-    scope.write('wfmoutpre:byt_n 2')            # Bytes per sample, use 1 or 2 for analog channels
-
-    scope.write('acquire:state OFF')
-    r = scope.query('*opc?')    # sync
+    with scope.batch():
+        scope.write('data:encdg SRIBINARY')                 # signed integer, may need to modify program for other encoding schemes
+        scope.write('data:start 1')
+        acq_record = cache.record_length(idn, record, len(chan_sel))   # this request was read back before, scopes round to allowed lengths
+        if acq_record is None:
+            acq_record = int(scope.query('horizontal:recordlength?'))   # pending commands are flushed ahead of the query
+        scope.write('data:stop {}'.format(acq_record))
+        scope.write(f'wfmoutpre:byt_n {byt_n}')     # Bytes per sample, use 1 or 2 for analog channels
+        scope.write('acquire:state OFF')
+    if caps.get('transfer', {}).get('byt_n') != byt_n:  # read back once per scope and firmware, then taken from the cache
+        byt_n = int(scope.query('wfmoutpre:byt_n?'))
+    cache.update(idn, record_lengths={record_key(record, len(chan_sel)): acq_record},
+                 transfer={'encdg': 'SRIBINARY', 'byt_n': byt_n})
+    if capture2file is False:
+        bin_wave = np.empty(acq_record, dtype='h' if byt_n == 2 else 'b')  # preallocated once, waveform data is received directly into it
+    archive = WaveArchive('test.twa', 'w') if save2file is True or capture2file is True else None     # one record per channel, memory mappable
+    save_time = 0
     start_time = time.time()    # beginning of transfer.
 
     # Curve loop, channels 1 - 8
     for i in chan_sel:
-        scope.write('data:source ch{:d}'.format(i))  # only a single source is allowed per curve query
-        r = scope.query('*opc?')    # sync
-
-        scope.write('curve?')   # initiates waveform data dump
-        bin_wave = scope.read_bin_wave()  # reads binary waveform data from scope buffer
-        print(f'Byte length of Ch{i} ', len(bin_wave))
+        if capture2file is True:    # preamble, curve? and archive record in one step, disk write overlaps network transfer
+            rec = archive.receive(scope, f'ch{i}', idn)
+            n_bytes = archive.records[rec]['n_points'] * byt_n
+        else:
+            scope.write('data:source ch{:d}'.format(i))  # only a single source is allowed per curve query
+            r = scope.query('*opc?')    # sync
+
+            scope.write('curve?')   # initiates waveform data dump
+            n_bytes = scope.read_bin_wave_into(bin_wave)  # reads binary waveform data from scope buffer, no intermediate copies
+        print(f'Byte length of Ch{i} ', n_bytes)
+        if capture2file is False and archive is not None:     # raw samples saved with preamble, IDN, source and timestamp
+            t_save = time.time()
+            archive.append(bin_wave[:n_bytes // bin_wave.itemsize], f'ch{i}', scope.preamble(f'ch{i}'), idn)
+            save_time += time.time() - t_save
 
     stop_time = time.time()
-    print('time to complete transfer after scope setup/acquisition: ', stop_time - start_time)
+    print('time to complete transfer after scope setup/acquisition: ', stop_time - start_time - save_time)
     scope.write('display:waveform ON')  # re-enable waveform traces for image save
 
+    if capture2file is True:
+        bin_wave = archive[rec]     # memory mapped, samples are paged in on access
+    else:
+        bin_wave = bin_wave[:n_bytes // bin_wave.itemsize]  # samples received, the rest of the preallocated buffer is uninitialized
+
     # create scaled vectors for file save or plotting
-    scaled_time = horiz_scale(scope)
-    scaled_amp = vert_scale(scope, bin_wave)
+    scaled_time = horiz_scale(scope, f'ch{chan_sel[-1]}', len(bin_wave))
+    scaled_amp = vert_scale(scope, f'ch{chan_sel[-1]}', bin_wave)
 
-    if save2file is True:   # dumps scaled time array and raw waveform data array to file in CWD
-        with open('test.bin', 'wb') as f:
-            # np.save(f, scaled_time)
-            # np.save(f, scaled_amp)
-            np.save(f, bin_wave)    # save binary data to file, needs header for scaling and timing information
-            print("time to save:", time.time() - stop_time)
+    if archive is not None:     # writes the index table, reopen with WaveArchive('test.twa') to read records back
+        archive.close()
+        print("time to save:", save_time)
 
     if save_img is True:    # fetches image from scope and saves to CWD
         from datetime import datetime
         dt = datetime.now()  # timestamp for PC filename
         fname_local = dt.strftime((('{:s}_{:s}_%Y%m%d_%H%M%S.%f')[:-3] + '.png').format(model, serial))  # example: "MSO58B_B025564_20240404_115123.321.png"
         fname_scope = 'temp.png'
-        path_scope = scope.query('filesystem:homedir?')
+        path_scope = caps['home']   # cached, no filesystem:homedir? round trip
         print('scope dir: {:s}'.format(path_scope))
         scope.write('filesystem:cwd {:s}'.format(path_scope))
         img_data = scope.fetch_screen(fname_scope)
@@ -140,13 +157,17 @@ if __name__ == "__main__":
     print("All event codes/messages:", scope.query('allev?'))   # displays event codes and messages, also clears EVMsg? queue
     scope.clear()   # clear buffer
 
+    if profile is True:     # wait-for-first-byte vs transfer time per SCPI header
+        scope.stats.to_csv('transfer_stats.csv')
+
     # close socket
     scope.close()
 
     if plots is True:
         import matplotlib.pyplot as plt        # (optional) used for plots, version 3.5.2
         # plotting
-        plt.plot(scaled_time, scaled_amp)
+        plot_time, plot_amp = preview(scaled_amp, scaled_time, plot_columns)  # a few thousand points regardless of record length
+        plt.plot(plot_time, plot_amp)
         plt.title('Channel {:d}'.format(chan_sel[-1]))  # plot label
         plt.xlabel('Time (seconds)')  # x label
         plt.ylabel('Amplitude (volts)')  # y label
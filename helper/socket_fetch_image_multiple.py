@@ -3,47 +3,29 @@ Proof of concept socket instrument communication script which can fetch multiple
 The images are saved to a temp file before transport
 Image are saved to CWD of client's python program
 this is configured to run on a non-windows OS scope
+Captures run through screenshot_service.py: one connection, home directory resolved once,
+disk writes on a background thread and error checks every 'check_every' images
 
 '''
-from socket_instr import SocketInstr
-from datetime import datetime
+from screenshot_service import ScreenshotService
 import time
 
 # user config:
 scope_ip = '127.0.0.1'
 num_of_imgs = 20
+check_every = 10    # images between *esr?/allev? error checks
 
-scope = SocketInstr(scope_ip, 4000, timeout=20)  # Default port = 4000
-scope.clear()               # clears read buffer
-scope.write('*cls')         # clears event status register
+with ScreenshotService(scope_ip, 4000, check_every=check_every, timeout=20) as svc:    # Default port = 4000
+    print(f'Connected to: {svc.model}, {svc.serial}')
+    print('scope dir: {:s}'.format(svc.home))
 
-ID = scope.query('*idn?').split(',')
-model = ID[1]
-serial = ID[2]
-print(f'Connected to: {model}, {serial}')
+    for i in range(0, num_of_imgs):
+        start = time.time()
+        fname_local = svc.capture()     # fetch_screen, is a robust method for importing a screen capture
+        print(f'captured {fname_local}, time to complete:', time.time() - start)
 
-
-for i in range(0, num_of_imgs):
-    start = time.time()
-    dt = datetime.now()  # timestamp for PC filename
-    timestamp = dt.strftime('%Y%m%d_%H%M%S.%f')[:-4]  # Keeps YYYYMMDD_HHMMSS.XX
-    fname_local = f'{model}_{serial}_{timestamp}.png'
-    # fname_local = dt.strftime(('{:s}_{:s}_%Y%m%d_%H%M%S.%f')[:-3] + '.png').format(model, serial)    # model/serial, date/time filename on host PC, year/month/day_hour/minute/second/millisecond    fname_scope = 'temp.png'
-    path_scope = scope.query('filesystem:homedir?')
-    fname_scope = 'temp.png'
-
-    # print('scope dir: {:s}'.format(path_scope))
-    scope.write('filesystem:cwd {:s}'.format(path_scope))
-    img_data = scope.fetch_screen(fname_scope)  # fetch_screen, is a robust method for importing a screen capture
-    with open(fname_local, 'wb') as f:
-        f.write(img_data)
-
-    print('saved image successfully')
-    print('Time to complete:', time.time() - start)
+    print(f'{svc.count} images at {svc.rate():.2f} images/s')
 
     # error checking
-    print('Event Status Register:', scope.query('*esr?'))
-    print("All event codes/messages:", scope.query('allev?'))   # displays event codes and messages, also clears EVMsg? queue
-
-# close socket
-scope.close()
+    print('Event Status Register:', svc.scope.query('*esr?'))
+    print("All event codes/messages:", svc.scope.query('allev?'))   # displays event codes and messages, also clears EVMsg? queue
@@ -14,53 +14,352 @@ Tested on MDO3000/4000C and 2/3/4/5(B)/6(B) series platform scopes
 '''
 
 import socket
-import sys
 import re
+import json
+import struct
+import time
+import csv
+from contextlib import contextmanager
+
+
+PNG_SIGNATURE = b'\x89PNG\r\n\x1a\n'     # first 8 Bytes of every PNG file, see read_image_data()
+
+
+class SocketInstrError(Exception):     # base class of all socket_instr errors
+    pass
+
+
+class InstrConnectionError(SocketInstrError):     # connection refused, reset or closed by the instrument
+    pass
+
+
+class InstrTimeoutError(InstrConnectionError):    # no data within the socket timeout
+    pass
+
+
+class InstrProtocolError(SocketInstrError):   # unexpected response format, e.g. bad block header or reply count
+    pass
+
+
+def _socket_error(msg, action, received=0):    # maps a socket exception to a typed error, 'received' = Bytes landed before failure
+
+    err_type = InstrTimeoutError if isinstance(msg, socket.timeout) else InstrConnectionError
+    err = err_type(f'{action}: {msg}' if str(msg) else f'{action}: timed out')
+    err.received = received
+    return err
+
+
+def split_response(resp):  # splits a ';' separated compound reply, semicolons inside quoted strings are kept
+    return [f.strip() for f in re.findall(r'(?:"[^"]*"|\'[^\']*\'|[^;"\'])+', resp)]
+
+
+def parse_ldir(resp):   # splits a filesystem:ldir? response into [name, date, size, ...] entries of 5 fields
+    a = re.findall(r'[^,;"]+', resp)
+    return [a[i:i + 5] for i in range(0, len(a), 5)]
+
+
+def scpi_header(scpi):  # normalized SCPI header used to group statistics, 'DATa:SOUrce CH1' -> 'DATA:SOURCE', 'CH2:SCAle?' -> 'CH<x>:SCALE?'
+
+    parts = [p for p in scpi.strip().split('\n')[0].split(';') if p.strip()]
+    if not parts:
+        return ''
+    head = parts[0].strip().lstrip(':').split(' ')[0].upper()
+    head = re.sub(r'(?<=[A-Z])\d+', '<x>', head)    # channel/math/bus numbers, CH1 -> CH<x>
+    return head + (';...' if len(parts) > 1 else '')   # compound messages are grouped under their first header
+
+
+class TransferStats(object):    # opt-in per command latency and throughput statistics, see SocketInstr(stats=True)
+
+    FIELDS = ('header', 'count', 'wall_s', 'wall_max_s', 'first_byte_s', 'transfer_s', 'bytes_sent', 'bytes_recv', 'recv_MBps')
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self._groups = {}       # header -> accumulated totals
+        self._open = None       # command currently waiting for / receiving its response
+
+    def begin(self, scpi, t_start, t_sent, n_bytes):   # new command sent, closes the previous one
+        self.commit()
+        self._open = {'header': scpi_header(scpi), 't_start': t_start, 't_sent': t_sent, 'sent': n_bytes,
+                      'recv': 0, 't_first': None, 't_last': t_sent}
+
+    def received(self, n_bytes, t):     # bytes arrived for the open command
+        rec = self._open
+        if rec is None:
+            return
+        if rec['t_first'] is None:
+            rec['t_first'] = t
+        rec['recv'] += n_bytes
+        rec['t_last'] = t
+
+    def commit(self):   # folds the open command into its header group
+        rec, self._open = self._open, None
+        if rec is None:
+            return
+        g = self._groups.setdefault(rec['header'], dict.fromkeys(self.FIELDS[1:-1], 0))
+        wall = rec['t_last'] - rec['t_start']
+        g['count'] += 1
+        g['wall_s'] += wall
+        g['wall_max_s'] = max(g['wall_max_s'], wall)
+        g['bytes_sent'] += rec['sent']
+        g['bytes_recv'] += rec['recv']
+        if rec['t_first'] is not None:
+            g['first_byte_s'] += rec['t_first'] - rec['t_sent']     # instrument processing + network latency
+            g['transfer_s'] += rec['t_last'] - rec['t_first']       # bandwidth limited part of the response
+
+    @contextmanager
+    def host(self, label):  # times host-side work (scaling, saving, ...) under its own label
+        self.commit()
+        t_start = time.perf_counter()
+        try:
+            yield
+        finally:
+            g = self._groups.setdefault(f'host:{label}', dict.fromkeys(self.FIELDS[1:-1], 0))
+            wall = time.perf_counter() - t_start
+            g['count'] += 1
+            g['wall_s'] += wall
+            g['wall_max_s'] = max(g['wall_max_s'], wall)
+
+    def summary(self):  # aggregates as {header: {count, wall_s, ..., recv_MBps}}
+        self.commit()
+        out = {}
+        for header, g in self._groups.items():
+            out[header] = dict(g)
+            out[header]['recv_MBps'] = g['bytes_recv'] / g['transfer_s'] / 1e6 if g['transfer_s'] else 0.0
+        return out
+
+    def to_json(self, path):
+        with open(path, 'w') as f:
+            json.dump(self.summary(), f, indent=2)
+
+    def to_csv(self, path):
+        with open(path, 'w', newline='') as f:
+            w = csv.DictWriter(f, fieldnames=self.FIELDS)
+            w.writeheader()
+            for header, g in self.summary().items():
+                w.writerow(dict(g, header=header))
+
+
+class WaveformPreamble(object):   # typed WFMOutpre? fields, filled from one reply, see SocketInstr.preamble()
+
+    # long form field name -> (attribute, type), verbose off short forms are mapped through PREAMBLE_SHORT
+    FIELDS = {'BYT_NR': ('byt_n', int), 'BIT_NR': ('bit_n', int), 'ENCDG': ('encdg', str), 'BN_FMT': ('bn_fmt', str),
+              'BYT_OR': ('byt_or', str), 'WFID': ('wfid', str), 'NR_PT': ('nr_pt', int), 'PT_FMT': ('pt_fmt', str),
+              'PT_ORDER': ('pt_order', str), 'XUNIT': ('xunit', str), 'XINCR': ('xincr', float), 'XZERO': ('xzero', float),
+              'PT_OFF': ('pt_off', int), 'YUNIT': ('yunit', str), 'YMULT': ('ymult', float), 'YOFF': ('yoff', float),
+              'YZERO': ('yzero', float)}
+    PREAMBLE_SHORT = {'BYT_N': 'BYT_NR', 'BIT_N': 'BIT_NR', 'ENC': 'ENCDG', 'BN_F': 'BN_FMT', 'BYT_O': 'BYT_OR', 'WFI': 'WFID',
+                      'NR_P': 'NR_PT', 'PT_F': 'PT_FMT', 'PT_OR': 'PT_ORDER', 'XUN': 'XUNIT', 'XIN': 'XINCR', 'XZE': 'XZERO',
+                      'PT_O': 'PT_OFF', 'YUN': 'YUNIT', 'YMU': 'YMULT', 'YOF': 'YOFF', 'YZE': 'YZERO'}
+
+    def __init__(self, **fields):
+        for attr, _ in self.FIELDS.values():
+            setattr(self, attr, None)
+        self.extra = {}     # fields not listed in FIELDS (e.g. DOMAIN, WFMTYPE on newer firmware), kept as strings
+        for k, v in fields.items():
+            setattr(self, k, v)
+
+    @classmethod
+    def parse(cls, resp):   # parses a WFMOutpre? reply sent with HEADer on, e.g. ':WFMOUTPRE:BYT_NR 2;BIT_NR 16;ENCDG BINARY;...'
+
+        pre = cls()
+        for field in split_response(resp):
+            name, _, value = field.partition(' ')
+            name = name.lstrip(':').upper().rsplit(':', 1)[-1]  # ':WFMOUTPRE:BYT_NR' / ':WFMO:BYT_N' -> field name
+            name = cls.PREAMBLE_SHORT.get(name, name)
+            value = value.strip()
+            if name in cls.FIELDS:
+                attr, typ = cls.FIELDS[name]
+                setattr(pre, attr, typ(float(value)) if typ is int else typ(value.strip('"')))
+            else:
+                pre.extra[name] = value
+        if pre.byt_n is None:
+            error_message = f'WFMOutpre? reply has no BYT_Nr field, HEADer on expected: {resp[:80]!r}'
+            raise InstrProtocolError(error_message)
+        return pre
+
+    @property
+    def dtype(self):    # numpy dtype of curve? samples, requires numpy
+        import numpy as np
+        order = '<' if 'LSB' in (self.byt_or or '').upper() else '>'    # SRIBINARY = LSB first, RIBINARY = MSB first
+        kind = 'u' if 'RP' in (self.bn_fmt or '').upper() else 'i'      # RP = unsigned, RI = signed integer
+        return np.dtype(f'{order}{kind}{self.byt_n}')
+
+    def to_dict(self):
+        return {attr: getattr(self, attr) for attr, _ in self.FIELDS.values()}
+
+    def __repr__(self):
+        return f'WaveformPreamble({", ".join(f"{k}={v!r}" for k, v in self.to_dict().items())})'
 
 
 ''' Methods for instrument socket connection and data transfer '''
 
 
 class SocketInstr(object):
-    def __init__(self, host, port, timeout=10):     # Initialization of socket object
+    def __init__(self, host, port, timeout=10, chunk_size=65536, stats=False, profile=None):     # Initialization of socket object
+
+        self.host = host
+        self.port = port
+        self.chunk_size = chunk_size    # recv() size used to fill the receive buffer, default 64KiB
+        self.curve_window = None        # preferred iter_curve() window in Bytes, None = 10M points
+        self.profile = {}               # transport settings from transport_tuner.py, see apply_profile()
+        self._rbuf = bytearray()        # receive buffer, keeps bytes received past the last consumed response
+        self._batch = None              # pending set commands while inside batch(), None when writes go out immediately
+        self._batch_max = 0             # maximum message size for coalesced set commands
+        self._preambles = {}            # (source, acq) -> WaveformPreamble, cleared by set commands, see preamble()
+        self.stats = TransferStats() if stats else None     # opt-in per command timing, see TransferStats
+        self.timeout = timeout
+        if profile is not None:
+            self.apply_profile(profile)
+        self._connect()
+
+    def _set_socket_options(self):  # socket options of the current profile, buffer sizes must be set before connect() to affect TCP window scaling
+
+        p = self.profile
+        if 'so_rcvbuf' in p:
+            self.socket.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, p['so_rcvbuf'])
+        if 'so_sndbuf' in p:
+            self.socket.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, p['so_sndbuf'])
+        if 'tcp_nodelay' in p:
+            self.socket.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, int(p['tcp_nodelay']))
+
+    def apply_profile(self, profile):  # applies a transport profile chosen by transport_tuner.calibrate()
+
+        # profile keys (all optional): so_rcvbuf, so_sndbuf, tcp_nodelay, chunk_size, curve_window.
+        # socket options apply to the open connection immediately, the buffer sizes take full effect from the next reconnect()
+        self.profile = dict(profile)
+        self.chunk_size = profile.get('chunk_size', self.chunk_size)
+        self.curve_window = profile.get('curve_window', self.curve_window)
+        if hasattr(self, 'socket'):
+            self._set_socket_options()
+
+    def _connect(self):     # opens the TCP connection, raises InstrConnectionError/InstrTimeoutError on failure
 
         self.socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)     # AF_INET = IPV4, SOCK_STREAM = TCP
         try:
-            self.socket.connect((host, port))   # Attempt connection to instrument (IPV4 address, socket port)
-            self.socket.setblocking(False)      # non-blocking is best for asynchronous communication
-            self.socket.settimeout(timeout)     # default timeout set to 10 seconds
+            self._set_socket_options()
+            self.socket.settimeout(self.timeout)    # blocking with timeout, default 10 seconds. See async_socket_instr.py for asyncio use
+            self.socket.connect((self.host, self.port))   # Attempt connection to instrument (IPV4 address, socket port)
         except socket.error as msg:             # error checking
-            print("Error: could not create socket")
-            print("Description: " + str(msg))
-            sys.exit()
+            self.socket.close()
+            raise _socket_error(msg, f'could not connect to {self.host}:{self.port}') from msg
+
+    def reconnect(self):    # drops the connection and any buffered data, connects again and sends a device clear
+
+        self.close()
+        self._rbuf.clear()
+        self._batch = None
+        self._preambles.clear()
+        self._connect()
+        self.clear()
 
     def close(self):   # socket closing function
 
-        self.socket.shutdown(socket.SHUT_RDWR)  # informs server (instrument) prior to closure
+        try:
+            self.socket.shutdown(socket.SHUT_RDWR)  # informs server (instrument) prior to closure
+        except socket.error:    # connection already dropped by the instrument
+            pass
         self.socket.close()
 
+    def _fill(self):        # receives one chunk from the socket and appends it to the receive buffer
+
+        chunk = self.socket.recv(self.chunk_size)
+        if not chunk:           # empty recv means the instrument closed the connection
+            raise ConnectionResetError('connection closed by instrument')
+        if self.stats is not None:
+            self.stats.received(len(chunk), time.perf_counter())
+        self._rbuf += chunk     # bytearray append is amortized O(1), no re-copy of previous data
+        return len(chunk)
+
     def read(self):         # socket data receive method, decodes to ASCII string
 
         try:
-            resp = self.socket.recv(1024)       # default 1KiB
-            while resp[-1:] != b'\n':           # check for EOL linefeed char
-                resp += self.socket.recv(1024)  # receive and append more data
-            resp = resp.decode('latin_1').strip()   # convert Bytes to string
+            eol = self._rbuf.find(b'\n')        # single byte find() is a memchr() scan
+            while eol < 0:                      # check for EOL linefeed char
+                start = len(self._rbuf)         # only scan newly received data for the linefeed
+                self._fill()                    # receive and append more data
+                eol = self._rbuf.find(b'\n', start)
+            resp = self._rbuf[:eol]
+            del self._rbuf[:eol + 1]            # consume response and linefeed, leftover bytes stay buffered
         except socket.error as msg:
-            print("Error: unable to recv()")
-            print("Description: " + str(msg))
-            sys.exit()
-        return resp  # return response from instrument
+            raise _socket_error(msg, 'unable to recv()') from msg
+        return resp.decode('latin_1').strip()   # convert Bytes to string, return response from instrument
 
-    def write(self, scpi):  # Socket Write SCPI to instrument method, encodes string to bytes
+    def _send(self, data):  # sends raw Bytes to the instrument
 
-        scpi = f'{scpi}\n'.encode('latin_1')    # convert string to Bytes prior to send
         try:
-            self.socket.sendall(scpi)   # send Bytes
+            if self.stats is None:
+                self.socket.sendall(data)   # send Bytes
+            else:
+                t_start = time.perf_counter()
+                self.socket.sendall(data)
+                self.stats.begin(data.decode('latin_1'), t_start, time.perf_counter(), len(data))
         except socket.error as msg:
-            print("Error: send() failed")
-            print("Description: " + str(msg))
-            sys.exit()
+            raise _socket_error(msg, 'send() failed') from msg
+
+    def write(self, scpi):  # Socket Write SCPI to instrument method, encodes string to bytes
+
+        if self._preambles and any('?' not in p and not scpi_header(p).startswith(('DATA:SOU', 'DAT:SOU')) for p in scpi.split(';') if p.strip()):
+            self._preambles.clear()     # a set command may change scaling or the data window, cached preambles are stale
+        if self._batch is not None:
+            if '?' not in scpi and not scpi.startswith('!'):    # set commands are held until the batch is flushed
+                self._batch.append(scpi.lstrip(':'))
+                return
+            self.flush()    # queries and !d/!r flags must see every earlier setting, send pending commands first
+        self._send(f'{scpi}\n'.encode('latin_1'))    # convert string to Bytes prior to send
+
+    def flush(self):    # sends set commands held by batch(), joined with ';:' into messages of at most batch max bytes
+
+        if not self._batch:
+            return
+        messages = []
+        msg = self._batch[0]
+        for scpi in self._batch[1:]:
+            if len(msg) + len(scpi) + 2 > self._batch_max:
+                messages.append(msg)
+                msg = scpi
+            else:
+                msg = f'{msg};:{scpi}'
+        messages.append(msg)
+        self._batch.clear()
+        self._send(''.join(f'{m}\n' for m in messages).encode('latin_1'))     # all messages leave in one send
+
+    @contextmanager
+    def batch(self, max_bytes=1024, sync=True):    # coalesces set commands written inside the block into a handful of messages
+
+        # with scope.batch():
+        #     scope.write('ch1:scale 0.5')
+        #     scope.write('horizontal:scale 1e-6')
+        # commands are flushed once at the end of the block, followed by one *opc? sync if sync=True.
+        # queries inside the block still work, pending commands are flushed ahead of them
+        if self._batch is not None:     # nested batch, the outer block flushes
+            yield self
+            return
+        self._batch = []
+        self._batch_max = max_bytes
+        try:
+            yield self
+            self.flush()
+        finally:
+            self._batch = None      # commands still pending when the block fails are dropped
+        if sync:
+            self.query('*opc?')
+
+    @contextmanager
+    def _keep_data_window(self):    # restores the caller's data:source, data:start and data:stop when the block exits
+
+        saved = self.query_many(['data:source?', 'data:start?', 'data:stop?'])
+        restore = f'data:source {saved[0]};:data:start {saved[1]};:data:stop {saved[2]}'
+        try:
+            yield
+        except BaseException:
+            try:
+                self.write(restore)
+            except SocketInstrError:    # connection lost, the original error is the one reported
+                pass
+            raise
+        self.write(restore)
 
     def query(self, scpi):  # Socket Query SCPI from instrument, references both write and read functions
 
@@ -68,44 +367,215 @@ class SocketInstr(object):
         resp = self.read()
         return resp         # return response from instrument
 
-    def read_bytes(self, n_bytes):  # reads raw data, requires byte length as argument
+    def _recv_into(self, mv):   # fills writable byte memoryview 'mv' completely, buffered bytes are used first
 
-        raw_data = bytearray(n_bytes)  # Initialize byte array of N-length
-        mv = memoryview(raw_data)     # object 'raw_data' spliced for much faster manipulation. 'mv' points to 'raw_data' object in memory
+        total = n_bytes = mv.nbytes
+        c = min(n_bytes, len(self._rbuf))   # bytes already buffered by a previous read() are used first
+        if c:
+            mv[:c] = self._rbuf[:c]
+            del self._rbuf[:c]
+            mv = mv[c:]
+            n_bytes -= c
         try:
             while n_bytes:     # While data remains
                 c = self.socket.recv_into(mv, n_bytes)   # recv n_bytes into mv, c = num bytes recvd
+                if not c:
+                    raise ConnectionResetError('connection closed by instrument')
+                if self.stats is not None:
+                    self.stats.received(c, time.perf_counter())
                 mv = mv[c:]     # appends n_bytes received to mv object
                 n_bytes -= c    # removes number of bytes read from mv
         except socket.error as msg:
-            print("Error: unable to recv()")
-            print("Description: " + str(msg))
-            sys.exit()
+            raise _socket_error(msg, 'unable to recv()', received=total - n_bytes) from msg    # Bytes landed are kept for resume
+
+    def query_many(self, queries):  # pipelined queries in one compound message, returns replies as a list in order
+
+        # queries are joined as 'q1;:q2;:q3' so the scope answers with one 'r1;r2;r3' line in a single round trip
+        queries = list(queries)
+        if not queries:
+            return []
+        resp = split_response(self.query(';:'.join(q.lstrip(':') for q in queries)))
+        if len(resp) != len(queries):
+            error_message = f'expected {len(queries)} replies to compound query, received {len(resp)}: {resp}'
+            raise InstrProtocolError(error_message)
+        return resp
+
+    def preamble(self, source, acq=None):  # WaveformPreamble of source from one WFMOutpre? round trip, cached
+
+        # cached per (source, acq) until the next set command sent through write(). 'acq' identifies the acquisition,
+        # e.g. an acquire:numacq? value, when the scope keeps acquiring between calls; None while acquisition is stopped
+        key = (source.upper(), acq)
+        pre = self._preambles.get(key)
+        if pre is None:
+            # one round trip: the caller's HEADer and DATa:SOUrce are read in the same message, WFMOutpre? is read with
+            # HEADer on (fields by name) and both settings are restored afterwards with a set command, no reply
+            self.flush()    # held batch() commands must apply before the preamble is read
+            self._send(f'header?;:data:source?;:data:source {source};:header 1;:wfmoutpre?\n'.encode('latin_1'))
+            fields = split_response(self.read())
+            header, data_source = (f.split(' ')[-1] for f in fields[:2])     # ':HEADER 1' or '0', ':DATA:SOURCE CH1' or 'CH1'
+            self._send(f'header {header};:data:source {data_source}\n'.encode('latin_1'))
+            pre = WaveformPreamble.parse(';'.join(fields[2:]))
+            self._preambles[key] = pre
+        return pre
+
+    def read_bytes(self, n_bytes):  # reads raw data, requires byte length as argument
+
+        raw_data = bytearray(n_bytes)  # Initialize byte array of N-length
+        self._recv_into(memoryview(raw_data))   # 'raw_data' filled in place through a memoryview, no intermediate copies
         return raw_data
 
     def clear(self):        # behaves like pyvisa device.clear(), used for debugging
         self.write('!d')    # device clear flag for supported instruments
+        self._rbuf.clear()  # discard any stale buffered response data
 
     ''' Instrument specific functions '''
 
-    def read_bin_wave(self):   # IEEE Binary block header parsing and waveform reading function, references read_bytes()
+    def _buffer_at_least(self, n_bytes):  # receives until at least n_bytes are held in the receive buffer
+
+        try:
+            while len(self._rbuf) < n_bytes:
+                self._fill()
+        except socket.error as msg:
+            raise _socket_error(msg, 'unable to recv()') from msg
+
+    def read_block_header(self):  # IEEE 488.2 definite length block header parsing, returns number of data bytes that follow
+
+        # binary block header format represented by example: (#72500000[Bytes of binary data]\n)
+        self._buffer_at_least(2)
+        while self._rbuf[:1] in (b'\n', b'\r', b' '):     # skip stray whitespace left before the block
+            del self._rbuf[:1]
+            self._buffer_at_least(2)
+        if self._rbuf[:1] != b'#':
+            error_message = f'expected IEEE 488.2 block header, received {bytes(self._rbuf[:16])!r}'
+            raise InstrProtocolError(error_message)
+        byte_len = int(self._rbuf[1:2].decode('latin_1'), base=16)    # 2nd character representing number of length digits, base 16 representation
+        self._buffer_at_least(byte_len + 2)
+        num_bytes = int(self._rbuf[2:byte_len + 2])     # num_bytes of waveform data to read after header
+        del self._rbuf[:byte_len + 2]                   # consume header, data bytes already received stay buffered
+        return num_bytes
+
+    def _skip_linefeed(self):   # consumes the linefeed terminating a binary block, if present
+
+        self._buffer_at_least(1)
+        if self._rbuf[:1] == b'\n':
+            del self._rbuf[:1]
+
+    def read_bin_wave_into(self, buf, on_data=None, chunk_bytes=1 << 22):  # zero-copy waveform read into a caller supplied writable buffer, returns num bytes written
 
-        # first we need to read and parse binary block header by format represented by example: (#72500000[Bytes of binary data]\n)
-        bin_header = self.read_bytes(18)           # first 18 Bytes should contain all binary block header information in any case, tested to 1 Gpts
-        byte_len = int(bin_header.decode('latin_1').strip()[1], base=16)        # 2nd character representing number of bytes, base 16 representation
-        num_bytes = int(bin_header.decode('latin_1').strip()[2:byte_len + 2])   # num_bytes of waveform data to read after header
-        rem = bin_header[byte_len + 2:]             # remaining bytes from header to be included in returned waveform data
+        # 'buf' may be a numpy array (int8/int16 matching wfmoutpre:byt_n), bytearray or any writable memoryview.
+        # on_data(n) is called with the Bytes landed so far after every chunk_bytes (keep it even for 2 Byte samples),
+        # so the received part can be processed while the rest of the block is still arriving
+        num_bytes = self.read_block_header()
+        mv = memoryview(buf).cast('B')      # flat byte view of caller buffer, data lands directly in its memory
+        if num_bytes > mv.nbytes:
+            error_message = f'buffer of {mv.nbytes} bytes too small for {num_bytes} byte waveform block'
+            raise InstrProtocolError(error_message)
+        if on_data is None:
+            self._recv_into(mv[:num_bytes])
+        else:
+            for pos in range(0, num_bytes, chunk_bytes):
+                end = min(pos + chunk_bytes, num_bytes)
+                try:
+                    self._recv_into(mv[pos:end])
+                except InstrConnectionError as err:
+                    err.received = pos + getattr(err, 'received', 0)    # Bytes landed in buf, not only in this chunk
+                    raise
+                on_data(end)
+        self._skip_linefeed()
+        return num_bytes
 
-        wave_data = rem + self.read_bytes(num_bytes - len(rem) + 1)    # '+1' accounts for linefeed character
-        return wave_data[:-1]   # return waveform data without linefeed character
+    def read_bin_wave(self):   # IEEE Binary block header parsing and waveform reading function, references read_block_header()
+
+        num_bytes = self.read_block_header()
+        wave_data = bytearray(num_bytes)    # allocated once at the exact block size, filled in place
+        self._recv_into(memoryview(wave_data))
+        self._skip_linefeed()
+        return wave_data   # return waveform data without linefeed character
+
+    def curve_dtype(self):  # numpy dtype of curve? samples from current wfmoutpre settings, requires numpy
+
+        import numpy as np  # imported here so socket_instr remains usable without numpy
+        byt_n, byt_or, bn_fmt = self.query_many(['wfmoutpre:byt_n?', 'wfmoutpre:byt_or?', 'wfmoutpre:bn_fmt?'])  # single round trip
+        order = '<' if 'LSB' in byt_or.upper() else '>'   # SRIBINARY = LSB first, RIBINARY = MSB first
+        kind = 'u' if 'RP' in bn_fmt.upper() else 'i'       # RP = unsigned, RI = signed integer
+        return np.dtype(f'{order}{kind}{int(byt_n)}')
+
+    def iter_curve(self, source, chunk_points=None, start=1, stop=None):  # windowed curve? transfer, yields numpy arrays of chunk_points samples
+
+        # each window is requested before the previous one is yielded, so the scope streams the next
+        # window while the caller scales, reduces or saves the current one. Memory is bounded by ~2 windows.
+        # chunk_points=None uses the tuned curve_window (Bytes) of the transport profile, else 10M points.
+        # data:source/start/stop are restored when the generator finishes or is closed early
+        import numpy as np
+        if stop is None:
+            stop = int(self.query('horizontal:recordlength?'))
+        dtype = self.curve_dtype()
+        if chunk_points is None:
+            chunk_points = max(1, self.curve_window // dtype.itemsize) if self.curve_window else 10000000
+        windows = [(i, min(i + chunk_points - 1, stop)) for i in range(start, stop + 1, chunk_points)]
+        if not windows:
+            return
+        with self._keep_data_window():
+            self.write(f'data:source {source}')     # only a single source is allowed per curve query
+            self.write(f'data:start {windows[0][0]};:data:stop {windows[0][1]};:curve?')
+            for n, (first, last) in enumerate(windows):
+                chunk = np.empty(last - first + 1, dtype=dtype)
+                n_bytes = self.read_bin_wave_into(chunk)
+                pending = n + 1 < len(windows)
+                if pending:     # request next window before handing this one to the caller
+                    nxt_first, nxt_last = windows[n + 1]
+                    self.write(f'data:start {nxt_first};:data:stop {nxt_last};:curve?')
+                try:
+                    yield chunk[:n_bytes // dtype.itemsize]
+                except GeneratorExit:   # caller stopped early, drain the window already requested so the next query stays in sync
+                    if pending:
+                        self.read_bin_wave()
+                    raise
+
+    def fetch_curve(self, source, out=None, start=1, stop=None, retries=3, retry_delay=0.5):  # resumable curve? transfer into a numpy array
+
+        # on a timeout or dropped connection the points already landed in 'out' are kept, the connection is
+        # re-opened with a device clear and only the remaining range is requested again via data:start.
+        # reconnects are part of the retried block and back off from retry_delay, doubling per failure (max 8x).
+        # the error raised after 'retries' failures carries .landed, the whole points stored in 'out' so far.
+        # data:source/start/stop are set back to the caller's values afterwards, also after a resumed transfer.
+        # 'out' may be a preallocated array or np.memmap of the right dtype, otherwise one is allocated
+        import numpy as np
+        if stop is None:
+            stop = int(self.query('horizontal:recordlength?'))
+        dtype = self.curve_dtype()
+        if out is None:
+            out = np.empty(stop - start + 1, dtype=dtype)
+        raw = memoryview(out).cast('B')
+        landed = 0          # whole points received so far
+        failures = 0
+        with self._keep_data_window():     # the caller's data window and source are restored, also after a resume
+            while start + landed <= stop:
+                try:
+                    if failures:
+                        time.sleep(retry_delay * 2 ** min(failures - 1, 3))    # instrument may still be recovering from the drop
+                        self.reconnect()
+                    self.write(f'data:source {source};:data:start {start + landed};:data:stop {stop};:curve?')
+                    num_bytes = self.read_block_header()
+                    expected = (stop - start + 1 - landed) * dtype.itemsize
+                    if num_bytes != expected:
+                        error_message = f'curve? returned {num_bytes} Bytes, expected {expected}'
+                        raise InstrProtocolError(error_message)
+                    self._recv_into(raw[landed * dtype.itemsize:landed * dtype.itemsize + num_bytes])
+                    self._skip_linefeed()
+                    landed = stop - start + 1
+                except InstrConnectionError as err:
+                    landed += getattr(err, 'received', 0) // dtype.itemsize    # partial sample at the break is requested again
+                    failures += 1
+                    if failures > retries:
+                        err.landed = landed
+                        raise
+        return out
 
     # Robust image fetch sequence for 2/3/4/5(B)/6(B) series platform
 
     def dir_info(self):  # finds saved image directory
-        r = self.query('filesystem:ldir?')
-        a = re.findall(r'[^,;"]+', r)
-        b = [a[i:i + 5] for i in range(0, len(a), 5)]
-        return b
+        return parse_ldir(self.query('filesystem:ldir?'))
 
     def get_file_size(self, file):  # gets file sizing from scope for correct read buffer sizing through socket
         r = self.dir_info()
@@ -113,23 +583,66 @@ class SocketInstr(object):
         if len(a) == 0:
             p = self.query('filesystem:cwd?')
             error_message = f'file "{file}" not found on scope (path: {p})'
-            raise Exception(error_message)
+            raise InstrProtocolError(error_message)
         size = int(r[a[0]][2])
         return size
 
-    def fetch_screen(self, temp_file):  # saves temp file on scope, retrieves it, then deletes it to save disk space.
+    def read_image_data(self):  # size-free read of a PNG or BMP file sent by filesystem:readfile, returns None for other formats
+
+        # PNG: chunk headers are followed up to the IEND chunk, BMP: file size is stored in the file header.
+        # the transfer end is known from the data itself, no filesystem:ldir? listing is needed
+        self._buffer_at_least(8)
+        if self._rbuf[:8] == PNG_SIGNATURE:
+            pos = 8
+            while True:
+                self._buffer_at_least(pos + 8)
+                length, tag = struct.unpack('>I4s', self._rbuf[pos:pos + 8])
+                pos += 12 + length      # length, type, data, CRC
+                if tag == b'IEND':
+                    break
+        elif self._rbuf[:2] == b'BM':
+            pos = struct.unpack('<I', self._rbuf[2:6])[0]
+        else:
+            return None
+        if pos > len(self._rbuf):   # remainder is received straight into the result
+            dat = bytearray(pos)
+            self._recv_into(memoryview(dat))
+            return dat
+        self._buffer_at_least(pos)
+        dat = self._rbuf[:pos]
+        del self._rbuf[:pos]
+        return dat
+
+    def fetch_screen(self, temp_file, delete=True):  # saves temp file on scope, retrieves it, then deletes it to save disk space.
         """get screen from 5/6 series scope"""
         self.write(f'save:image "{temp_file}"')
         self.query('*opc?')
-        size = self.get_file_size(temp_file)
-        cmd = f'filesystem:readfile "{temp_file}"\n'
-        self.socket.send(cmd.encode('latin_1'))
-        self.socket.send(b'!r\n')  # Flag for scope read to buffer
-        dat = self.read_bytes(size)
-        r = self.socket.recv(512)
+        size_free = temp_file.lower().endswith(('.png', '.bmp'))    # end of transfer found from the file data, no directory listing
+        size = None if size_free else self.get_file_size(temp_file)
+        # '!r' flag for scope read to buffer, the *opc? reply follows the file data, or arrives alone when the file is missing
+        self._send(f'filesystem:readfile "{temp_file}"\n!r\n*opc?\n'.encode('latin_1'))
+        if size_free:
+            self._buffer_at_least(2)
+            if self._rbuf[:2] == b'1\n':  # PNG and BMP files never start with '1\n'
+                del self._rbuf[:2]
+                p = self.query('filesystem:cwd?')
+                error_message = f'no data received for "{temp_file}", file likely not found on scope (path: {p})'
+                raise InstrProtocolError(error_message)
+            dat = self.read_image_data()
+            if dat is None:
+                self.clear()    # end of an unknown format cannot be found, drop the rest of the transfer
+                error_message = f'"{temp_file}" is not a PNG or BMP file'
+                raise InstrProtocolError(error_message)
+        else:
+            dat = self.read_bytes(size)
+        r = self.read_bytes(1)
         if r != b'\n':
             error_message = 'file bytes request did not end with linefeed. file likely corrupted'
-            raise Exception(error_message)
-        self.write(f'filesystem:delete "{temp_file}"')
-        self.query('*opc?')
+            raise InstrProtocolError(error_message)
+        if self.read() != '1':  # *opc? sentinel
+            error_message = 'missing *opc? reply after file data'
+            raise InstrProtocolError(error_message)
+        if delete:  # delete=False keeps the temp file, save:image overwrites it on the next capture
+            self.write(f'filesystem:delete "{temp_file}"')
+            self.query('*opc?')
         return dat
@@ -0,0 +1,162 @@
+#!/usr/bin/env python
+'''
+Transport auto-tuner for socket_instr
+Measures round trip time and sustained curve? bandwidth against one instrument and derives
+the socket settings used by SocketInstr: SO_RCVBUF/SO_SNDBUF, TCP_NODELAY, recv chunk size
+and the preferred iter_curve() window. One setting does not fit both a local GbE link and a
+high latency VPN, so profiles are kept per endpoint (host:port) in a JSON file.
+Uses only python built-in modules, plus socket_instr.py in CWD (numpy is not required)
+
+    Example:
+        from socket_instr import SocketInstr
+        from transport_tuner import tune
+        scope = SocketInstr('192.168.1.10', 4000)
+        tune(scope)     # calibrates once, later runs load the saved profile for this endpoint
+
+        python transport_tuner.py 192.168.1.10 --port 4000 --force
+
+    Disclaimer:
+    This program is a proof of concept and provided "As-is".
+    Its contents may be altered to suit different applications.
+
+    Tested using Python v3.10.5
+'''
+
+import argparse
+import json
+import os
+import socket
+import statistics
+import time
+from socket_instr import SocketInstr  # socket_instr module required, include socket_instr.py in CWD
+
+PROFILE_FILE = os.path.join(os.path.expanduser('~'), '.socket_instr_profiles.json')
+PROBE_PROFILE = {'so_rcvbuf': 8 * 2**20, 'so_sndbuf': 2**20, 'tcp_nodelay': True}  # large buffers so calibration measures the link, not the OS defaults
+MIN_BUF, MAX_BUF = 256 * 2**10, 16 * 2**20      # socket buffer bounds in Bytes
+MIN_CHUNK, MAX_CHUNK = 64 * 2**10, 2**20        # recv chunk bounds in Bytes
+MIN_WINDOW, MAX_WINDOW = 2**20, 256 * 2**20     # curve window bounds in Bytes
+WINDOW_OVERHEAD = 0.05  # per window wait-for-first-byte allowed as a fraction of the window transfer time
+
+
+def _pow2(n, lo, hi):  # smallest power of two >= n, clamped to [lo, hi]
+    return min(max(1 << max(int(n) - 1, 0).bit_length(), lo), hi)
+
+
+def measure_rtt(instr, n=20):   # median *opc? round trip in seconds
+    samples = []
+    for _ in range(n):
+        t_start = time.perf_counter()
+        instr.query('*opc?')
+        samples.append(time.perf_counter() - t_start)
+    return statistics.median(samples)
+
+
+def measure_write_query(instr, nodelay, n=20):  # median time of a set command followed by a query, the pattern Nagle delays
+
+    instr.socket.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, int(nodelay))
+    samples = []
+    for _ in range(n):
+        t_start = time.perf_counter()
+        instr.write('*cls')
+        instr.query('*opc?')
+        samples.append(time.perf_counter() - t_start)
+    return statistics.median(samples)
+
+
+def measure_bandwidth(instr, min_seconds=0.5, max_bytes=64 * 2**20):  # sustained curve? throughput in Bytes/s and first byte latency in seconds
+
+    # windows start at 1MB and double until one transfer lasts min_seconds, or the record / max_bytes is exhausted.
+    # the caller's data:start/stop and wfmoutpre:byt_n settings are restored afterwards
+    saved = instr.query_many(['data:start?', 'data:stop?', 'wfmoutpre:byt_n?'])
+    record = int(instr.query('horizontal:recordlength?'))
+    instr.write('wfmoutpre:byt_n 1')
+    points = min(2**20, record)
+    try:
+        while True:
+            instr.write(f'data:start 1;:data:stop {points}')
+            instr.query('*opc?')
+            t_start = time.perf_counter()
+            instr.write('curve?')
+            num_bytes = instr.read_block_header()
+            t_first = time.perf_counter()   # header arrives with the first data bytes
+            instr.read_bytes(num_bytes)
+            instr._skip_linefeed()
+            t_stop = time.perf_counter()
+            elapsed = t_stop - t_first
+            if elapsed >= min_seconds or points >= min(record, max_bytes):
+                break
+            points = min(points * 2, record, max_bytes)
+    finally:
+        instr.write(f'data:start {saved[0]};:data:stop {saved[1]};:wfmoutpre:byt_n {saved[2]}')
+        instr.query('*opc?')
+    return num_bytes / max(elapsed, 1e-9), t_first - t_start
+
+
+def calibrate(instr, n=20):     # measures the link and returns a transport profile dict for SocketInstr.apply_profile()
+
+    instr.apply_profile(PROBE_PROFILE)
+    instr.reconnect()   # probe buffer sizes only take effect on a new connection
+    rtt = measure_rtt(instr, n)
+    nagle = measure_write_query(instr, False, n)
+    no_nagle = measure_write_query(instr, True, n)
+    bandwidth, first_byte = measure_bandwidth(instr)
+    bdp = bandwidth * rtt   # bandwidth delay product, Bytes in flight needed to keep the link busy
+
+    return {
+        'host': instr.host,
+        'port': instr.port,
+        'calibrated': time.time(),
+        'rtt_s': rtt,
+        'bandwidth_Bps': bandwidth,
+        'first_byte_s': first_byte,
+        'so_rcvbuf': _pow2(2 * bdp, MIN_BUF, MAX_BUF),     # 2x BDP so the receive window never closes while the host is busy
+        'so_sndbuf': _pow2(bdp, MIN_CHUNK, MAX_CHUNK),     # commands are small, enough for large batch() messages
+        'tcp_nodelay': no_nagle <= nagle,
+        'chunk_size': _pow2(bdp, MIN_CHUNK, MAX_CHUNK),    # one recv() drains about one round trip of data
+        'curve_window': _pow2(bandwidth * first_byte / WINDOW_OVERHEAD, MIN_WINDOW, MAX_WINDOW),
+    }
+
+
+def load_profile(host, port, path=PROFILE_FILE):    # saved profile of host:port, None if the endpoint was never calibrated
+    try:
+        with open(path) as f:
+            return json.load(f).get(f'{host}:{port}')
+    except (OSError, ValueError):
+        return None
+
+
+def save_profile(profile, path=PROFILE_FILE):   # adds or replaces the profile of its endpoint, other endpoints are kept
+    try:
+        with open(path) as f:
+            profiles = json.load(f)
+    except (OSError, ValueError):
+        profiles = {}
+    profiles[f'{profile["host"]}:{profile["port"]}'] = profile
+    with open(path, 'w') as f:
+        json.dump(profiles, f, indent=2)
+
+
+def tune(instr, path=PROFILE_FILE, max_age=7 * 86400, force=False):   # applies the saved profile, calibrating first if missing or older than max_age seconds
+
+    profile = None if force else load_profile(instr.host, instr.port, path)
+    if profile is None or time.time() - profile.get('calibrated', 0) > max_age:
+        profile = calibrate(instr)
+        save_profile(profile, path)
+    instr.apply_profile(profile)
+    instr.reconnect()   # buffer sizes are negotiated at connect
+    return profile
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='calibrate socket transport settings for one instrument')
+    parser.add_argument('host')
+    parser.add_argument('--port', type=int, default=4000)
+    parser.add_argument('--profiles', default=PROFILE_FILE, help='JSON file holding the per endpoint profiles')
+    parser.add_argument('--force', action='store_true', help='calibrate even if a saved profile exists')
+    args = parser.parse_args()
+
+    scope = SocketInstr(args.host, args.port, timeout=60)
+    profile = tune(scope, args.profiles, force=args.force)
+    scope.close()
+    for k, v in profile.items():
+        print(f'{k:>14}: {v}')
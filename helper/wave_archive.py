@@ -0,0 +1,198 @@
+#!/usr/bin/env python
+'''
+Self-describing, memory mappable waveform archive for socket_instr captures
+One file holds any number of records (channels x acquisitions). Each record keeps its
+WFMOutpre preamble, *IDN?, source, acquisition number and timestamp, so scaling and timing can
+be recovered later without the instrument. Raw samples are stored page aligned and are memory
+mapped on access, reading a window of a multi-GB archive only pages in that window.
+Every record also gets a chunk_index.ChunkIndex (per chunk min, max, mean, RMS), threshold and
+RMS/envelope queries use it to read only the chunks that can match.
+numpy required
+
+    File layout:
+        [4096 Bytes file header][record 0 samples][pad][record 1 samples][pad]...[JSON index table]
+        file header: 8 Bytes magic 'TEKWARC1', uint32 version, uint64 index offset, uint64 index length,
+                     uint32 record count (little endian), zero padded to 4096 Bytes
+        index table: JSON list, one entry per record: source, idn, acq, timestamp, offset, n_points,
+                     dtype (numpy dtype string), the preamble fields and the chunk statistics
+    The index is written by close(), records appended after the last close() are lost if the writer crashes.
+    Mode 'a' appends after the existing index, which stays valid (and the archive readable) until close()
+    writes the new index and points the header at it; the old index is left in place as unused bytes.
+
+    Example:
+        with WaveArchive('capture.twa', 'w') as arc:
+            for ch in ('ch1', 'ch2'):
+                arc.receive(scope, ch, idn)     # preamble, then curve?, curve data lands directly in the file
+        with WaveArchive('capture.twa') as arc:
+            i = arc.find(source='ch2')[-1]
+            window = arc.read(i, 10**9, 10**9 + 10**6)              # raw samples, only this window is read
+            volts, t = arc.scaled(i), arc.time_axis(i)              # waveform.ScaledWaveform, waveform.TimeAxis
+            for i, runs in arc.search(0.5, source='ch1'):            # sample runs above 0.5V in every ch1 record
+                print(i, arc.time_axis(i).time(runs[:, 0]))
+            v_rms = arc.index(i).rms(arc[i], 0, 10**9)              # RMS volts of the first 10^9 samples
+
+    Disclaimer:
+    This program is a proof of concept and provided "As-is".
+    Its contents may be altered to suit different applications.
+
+    Tested using Python v3.10.5
+'''
+
+import json
+import os
+import struct
+import time
+import numpy as np      # numpy version v1.23.1
+from waveform import ScaledWaveform, TimeAxis
+from chunk_index import ChunkIndex, CHUNK_POINTS
+
+ARCHIVE_MAGIC = b'TEKWARC1'
+ARCHIVE_VERSION = 1
+ARCHIVE_HEADER = struct.Struct('<8sIQQI')   # magic, version, index offset, index length, record count
+ARCHIVE_ALIGN = 4096    # file header size and record alignment, records start on a page boundary
+ARCHIVE_PREAMBLE = ('ymult', 'yoff', 'yzero', 'xincr', 'xzero', 'pt_off')    # preamble fields every record needs for scaling and timing
+
+
+class WaveArchive(object):
+    def __init__(self, path, mode='r', chunk_points=CHUNK_POINTS):    # mode 'r' read, 'w' create/overwrite, 'a' append to an existing archive
+
+        if mode not in ('r', 'w', 'a'):
+            error_message = f'invalid archive mode {mode!r}, use "r", "w" or "a"'
+            raise ValueError(error_message)
+        self.path = path
+        self.mode = mode
+        self.chunk_points = chunk_points    # samples per chunk statistics entry of new records
+        self.records = []       # index table entries, see module docstring
+        if mode == 'w' or (mode == 'a' and not os.path.exists(path)):
+            self._f = open(path, 'w+b')
+            self._f.write(bytes(ARCHIVE_ALIGN))
+            self._end = ARCHIVE_ALIGN   # end of the last record
+            self.mode = 'a'
+        else:
+            self._f = open(path, 'rb' if mode == 'r' else 'r+b')
+            magic, version, index_offset, index_len, count = ARCHIVE_HEADER.unpack(self._f.read(ARCHIVE_HEADER.size))
+            if magic != ARCHIVE_MAGIC:
+                error_message = f'"{path}" is not a waveform archive'
+                raise ValueError(error_message)
+            self._f.seek(index_offset)
+            self.records = json.loads(self._f.read(index_len).decode('utf-8'))
+            self._end = index_offset + index_len    # old index kept intact until close() replaces it in the header
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def __len__(self):
+        return len(self.records)
+
+    def _new_record(self, source, preamble, idn, acq, timestamp, dtype):  # index entry at the next aligned offset
+
+        if self.mode == 'r':
+            error_message = 'archive opened read only'
+            raise ValueError(error_message)
+        if preamble is not None and not isinstance(preamble, dict):    # socket_instr.WaveformPreamble
+            preamble = preamble.to_dict()
+        missing = [k for k in ARCHIVE_PREAMBLE if k not in (preamble or {})]
+        if missing:     # scaled(), time_axis() and volt level queries would be meaningless without them
+            error_message = f'preamble of {source} record is missing {", ".join(missing)}'
+            raise ValueError(error_message)
+        return {'source': source.upper(), 'idn': idn, 'acq': acq, 'timestamp': time.time() if timestamp is None else timestamp,
+                'offset': -(-self._end // ARCHIVE_ALIGN) * ARCHIVE_ALIGN, 'n_points': 0, 'dtype': np.dtype(dtype).str,
+                'preamble': preamble}
+
+    def append(self, data, source, preamble, idn='', acq=None, timestamp=None):    # stores a numpy array of raw samples, returns the record number
+
+        # 'preamble' is a socket_instr.WaveformPreamble or a dict with at least the ARCHIVE_PREAMBLE fields
+        data = np.ascontiguousarray(data)
+        rec = self._new_record(source, preamble, idn, acq, timestamp, data.dtype)
+        self._f.seek(rec['offset'])
+        self._f.write(memoryview(data).cast('B'))
+        rec['n_points'] = len(data)
+        rec['stats'] = ChunkIndex.scan(data, chunk_points=self.chunk_points).to_dict()
+        self._end = rec['offset'] + data.nbytes
+        self.records.append(rec)
+        return len(self.records) - 1
+
+    def receive(self, instr, source, idn='', acq=None, timestamp=None):  # curve? of source read straight into the archive, returns the record number
+
+        # the preamble is read first (it sizes and types the record), then curve? is sent. the record is
+        # preallocated and memory mapped, SocketInstr.read_bin_wave_into() receives directly into the page cache.
+        # the chunk statistics are added window by window as the data lands, while the next window is still arriving
+        preamble = instr.preamble(source)   # before curve?, the reply must not queue behind the curve block
+        rec = self._new_record(source, preamble, idn, acq, timestamp, preamble.dtype)
+        n_bytes = preamble.nr_pt * preamble.byt_n
+        instr.write(f'data:source {source};:curve?')
+        self._f.flush()
+        self._f.truncate(rec['offset'] + n_bytes)
+        region = np.memmap(self._f, dtype=np.uint8, mode='r+', offset=rec['offset'], shape=(n_bytes,))
+        samples = region.view(rec['dtype'])
+        index = ChunkIndex(self.chunk_points)
+        indexed = 0     # samples added to the index so far
+
+        def index_landed(n_landed):
+            nonlocal indexed
+            stop = n_landed // preamble.byt_n
+            index.add(samples[indexed:stop])
+            indexed = stop
+
+        received = instr.read_bin_wave_into(region, on_data=index_landed)
+        region.flush()
+        del samples, region
+        rec['n_points'] = received // preamble.byt_n
+        rec['stats'] = index.finish().to_dict()
+        self._end = rec['offset'] + received
+        self.records.append(rec)
+        return len(self.records) - 1
+
+    def find(self, source=None, acq=None):  # record numbers matching source and/or acquisition, in archive order
+        return [i for i, r in enumerate(self.records)
+                if (source is None or r['source'] == source.upper()) and (acq is None or r['acq'] == acq)]
+
+    def __getitem__(self, i):   # raw samples of record i as a read only np.memmap, nothing is read until accessed
+        rec = self.records[i]
+        if rec['n_points'] == 0:
+            return np.empty(0, dtype=rec['dtype'])
+        if self.mode == 'a':
+            self._f.flush()     # records written through the file buffer must reach the file before mapping
+        return np.memmap(self._f, dtype=rec['dtype'], mode='r', offset=rec['offset'], shape=(rec['n_points'],))
+
+    def read(self, i, start=0, stop=None):  # copy of raw samples [start:stop) of record i, only that window is read from disk
+        return np.array(self[i][start:stop])
+
+    def scaled(self, i, dtype='float64'):   # waveform.ScaledWaveform over the memory mapped record
+        return ScaledWaveform.from_preamble(self[i], self.records[i]['preamble'], dtype)
+
+    def time_axis(self, i):     # waveform.TimeAxis of record i
+        return TimeAxis.from_preamble(self.records[i]['preamble'], self.records[i]['n_points'])
+
+    def index(self, i):     # chunk_index.ChunkIndex of record i, scaled to volts with the record preamble
+        rec = self.records[i]
+        if 'stats' not in rec:  # record written without statistics, scanned once and kept for this session
+            rec['stats'] = ChunkIndex.scan(self[i], chunk_points=self.chunk_points).to_dict()
+        return ChunkIndex.from_dict(rec['stats'], rec['preamble'])
+
+    def search(self, level, source=None, acq=None, below=False):   # [(record number, (start, stop) runs)] of records with samples above (below) level volts
+
+        # records whose overall max (min) cannot cross the level are skipped without touching their samples,
+        # inside the other records only the candidate chunks are read
+        found = []
+        for i in self.find(source, acq):
+            runs = self.index(i).exceeds(self[i], level, below)
+            if len(runs):
+                found.append((i, runs))
+        return found
+
+    def close(self):    # writes the index table and file header, then closes the file
+
+        if self._f.closed:
+            return
+        if self.mode == 'a':
+            index = json.dumps(self.records).encode('utf-8')
+            self._f.seek(self._end)
+            self._f.write(index)
+            self._f.truncate(self._end + len(index))
+            self._f.seek(0)
+            self._f.write(ARCHIVE_HEADER.pack(ARCHIVE_MAGIC, ARCHIVE_VERSION, self._end, len(index), len(self.records)))
+        self._f.close()
@@ -0,0 +1,151 @@
+#!/usr/bin/env python
+'''
+Lazy waveform scaling and implicit time axis for socket_instr curve data
+ScaledWaveform keeps the raw int8/int16 curve? buffer (numpy array, np.memmap or a
+wave_archive.WaveArchive record) and applies the WFMOutpre vertical scaling
+    volts = (raw - YOFF) * YMULT + YZERO
+only to the samples a caller asks for. Indexing a window converts that window alone,
+to_array() converts the full record into one output buffer (float32 or float64, or a
+caller supplied out= array) without full length temporaries.
+TimeAxis describes the uniformly sampled horizontal axis by XZERO/XINCR/PT_OFF
+    t[n] = XZERO + (n - PT_OFF) * XINCR
+instead of a materialized time array; times are only computed for the indices asked for.
+numpy required
+
+    Example:
+        pre = scope.preamble('ch1')
+        wave = ScaledWaveform.from_preamble(bin_wave, pre)
+        window = wave[1000000:1001000]              # only 1000 samples converted
+        volts = wave.to_array('float32')            # one 4 Byte/sample buffer for the full record
+        wave.to_array(out=np.empty(len(wave)))      # converted into a preallocated array
+        t = TimeAxis.from_preamble(pre)
+        t.index(2.5e-6)                             # sample index nearest to 2.5us
+        t[t.window(0, 1e-6)].to_array()             # time values of the first microsecond after the trigger
+
+    Disclaimer:
+    This program is a proof of concept and provided "As-is".
+    Its contents may be altered to suit different applications.
+
+    Tested using Python v3.10.5
+'''
+
+import numpy as np      # numpy version v1.23.1
+
+
+class ScaledWaveform(object):
+    def __init__(self, raw, ymult, yoff=0.0, yzero=0.0, dtype='float64'):
+
+        self.raw = raw              # integer samples, never modified or copied
+        self.ymult = ymult          # volts / level
+        self.yoff = yoff            # reference position (level)
+        self.yzero = yzero          # reference voltage
+        self.dtype = np.dtype(dtype)    # result dtype of indexing and to_array() without arguments
+
+    @classmethod
+    def from_preamble(cls, raw, pre, dtype='float64'):  # scaling from a socket_instr.WaveformPreamble or wfmoutpre header dict
+        if isinstance(pre, dict):
+            return cls(raw, pre['ymult'], pre['yoff'], pre['yzero'], dtype)
+        return cls(raw, pre.ymult, pre.yoff, pre.yzero, dtype)
+
+    def __len__(self):
+        return len(self.raw)
+
+    def _scale(self, raw, out):    # (raw - yoff) * ymult + yzero computed in 'out', no further temporaries
+        np.subtract(raw, self.yoff, out=out, casting='unsafe')
+        out *= self.ymult
+        out += self.yzero
+        return out
+
+    def __getitem__(self, index):  # scaled samples of an index or slice, only that part of the record is converted
+        raw = self.raw[index]
+        if np.ndim(raw) == 0:
+            return self.dtype.type((raw - self.yoff) * self.ymult + self.yzero)
+        return self._scale(raw, np.empty(raw.shape, dtype=self.dtype))
+
+    def to_array(self, dtype=None, out=None, chunk_points=1 << 22):  # full record conversion into one buffer
+
+        # 'out' may be any float array of len(self) (e.g. np.memmap), it is filled chunk by chunk so
+        # a memory mapped raw buffer is paged in sequentially and only one chunk sized temporary is used
+        if out is None:
+            out = np.empty(len(self.raw), dtype=self.dtype if dtype is None else dtype)
+        elif len(out) != len(self.raw):
+            error_message = f'out has {len(out)} points, waveform has {len(self.raw)}'
+            raise ValueError(error_message)
+        for start in range(0, len(self.raw), chunk_points):
+            stop = min(start + chunk_points, len(self.raw))
+            self._scale(self.raw[start:stop], out[start:stop])
+        return out
+
+    def iter_chunks(self, chunk_points=1 << 22, dtype=None):   # yields (start index, scaled chunk) pairs, one chunk in memory at a time
+        buf = np.empty(min(chunk_points, len(self.raw)), dtype=self.dtype if dtype is None else dtype)
+        for start in range(0, len(self.raw), chunk_points):
+            raw = self.raw[start:start + chunk_points]
+            yield start, self._scale(raw, buf[:len(raw)])   # buffer reused, copy the chunk to keep it
+
+    def __array__(self, dtype=None, copy=None):    # np.asarray(wave) materializes the full record
+        return self.to_array(dtype)
+
+
+class TimeAxis(object):
+    def __init__(self, n, xincr, xzero=0.0, pt_off=0):
+
+        self.n = n              # number of samples
+        self.xincr = xincr      # seconds / sample
+        self.xzero = xzero      # time of sample pt_off, includes sub-sample trigger correction
+        self.pt_off = pt_off    # trigger sample index
+
+    @classmethod
+    def from_preamble(cls, pre, n=None):    # axis from a socket_instr.WaveformPreamble or wfmoutpre header dict, n defaults to NR_PT
+        if isinstance(pre, dict):
+            return cls(pre['nr_pt'] if n is None else n, pre['xincr'], pre['xzero'], pre['pt_off'])
+        return cls(pre.nr_pt if n is None else n, pre.xincr, pre.xzero, pre.pt_off)
+
+    def __len__(self):
+        return self.n
+
+    @property
+    def start(self):    # time of the first sample
+        return self.time(0)
+
+    @property
+    def stop(self):     # time of the last sample
+        return self.time(self.n - 1)
+
+    def time(self, index):  # time of a sample index, index may be a numpy array
+        if np.ndim(index):
+            return self.xzero + (np.asarray(index) - self.pt_off) * self.xincr
+        return self.xzero + (index - self.pt_off) * self.xincr
+
+    def index(self, t):     # nearest sample index of a time, clipped to the record, t may be a numpy array
+        i = np.clip(np.rint((np.asarray(t) - self.xzero) / self.xincr + self.pt_off), 0, self.n - 1).astype(np.int64)
+        return i if np.ndim(t) else int(i)
+
+    def window(self, t_start, t_stop):  # slice of the samples between t_start and t_stop (inclusive), for both axis and waveform
+        return slice(self.index(t_start), self.index(t_stop) + 1)
+
+    def __getitem__(self, index):   # time of one sample, or a TimeAxis describing a slice of this one
+
+        if isinstance(index, slice):
+            start, stop, step = index.indices(self.n)
+            n = len(range(start, stop, step))
+            return TimeAxis(n, self.xincr * step, self.time(start), 0)
+        if index < 0:
+            index += self.n
+        if not 0 <= index < self.n:
+            raise IndexError('time axis index out of range')
+        return self.time(index)
+
+    def to_array(self, dtype='float64', out=None):  # materializes the time values, only call on windows that need them
+
+        if out is None:
+            out = np.empty(self.n, dtype=dtype)
+        out[:] = np.arange(self.n, dtype=out.dtype)
+        out *= self.xincr
+        out += self.time(0)
+        return out
+
+    def __array__(self, dtype=None, copy=None):
+        return self.to_array('float64' if dtype is None else dtype)
+
+    def __repr__(self):
+        return f'TimeAxis(n={self.n}, xincr={self.xincr!r}, xzero={self.xzero!r}, pt_off={self.pt_off})'